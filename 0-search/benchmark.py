@@ -0,0 +1,215 @@
+import math
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+import bitboard
+import degrees
+import tictactoe
+from util import Node, QueueFrontier
+
+
+def main():
+    if len(sys.argv) == 2 and sys.argv[1] == "tictactoe":
+        benchmark_tictactoe()
+        return
+    if len(sys.argv) == 2 and sys.argv[1] == "parallel":
+        benchmark_parallel()
+        return
+    if len(sys.argv) not in [3, 4] or sys.argv[1] != "degrees":
+        sys.exit("Usage: python benchmark.py (degrees directory [queries] | tictactoe | parallel)")
+    directory = sys.argv[2]
+    queries = int(sys.argv[3]) if len(sys.argv) == 4 else 20
+
+    benchmark_frontiers()
+    graph = benchmark_loaders(directory)
+    benchmark_degrees(graph, queries)
+
+
+def benchmark_loaders(directory):
+    """
+    Compare load time and memory of the dict layout against the
+    compact CSR layout built from the CSV files, then time a cold run
+    that writes the snapshot and a warm run that maps it.
+    Returns the loaded CompactGraph.
+    """
+    loaders = [
+        ("dicts", load_dicts),
+        ("compact", lambda directory: degrees.load_compact_data(directory, cache=False)),
+    ]
+    for name, loader in loaders:
+        start = time.perf_counter()
+        loader(directory)
+        elapsed = time.perf_counter() - start
+
+        # Tracing slows allocation down, so measure memory on a separate load
+        tracemalloc.start()
+        loaded = loader(directory)
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del loaded
+        print(f"{name:>14}: loaded in {elapsed:.3f}s using {memory / 2 ** 20:.1f} MiB")
+
+    # Mapped snapshot pages are invisible to tracemalloc, so report the file size instead
+    snapshot_path = os.path.join(directory, degrees.SNAPSHOT_FILENAME)
+    if os.path.exists(snapshot_path):
+        os.remove(snapshot_path)
+    for name in ["snapshot cold", "snapshot warm"]:
+        start = time.perf_counter()
+        graph = degrees.load_compact_data(directory, cache=True)
+        elapsed = time.perf_counter() - start
+        size = os.path.getsize(snapshot_path) if os.path.exists(snapshot_path) else 0
+        print(f"{name:>14}: loaded in {elapsed:.3f}s, snapshot {size / 2 ** 20:.1f} MiB")
+    return graph
+
+
+def load_dicts(directory):
+    """
+    Load the dict layout from scratch, since load_data fills the
+    module's existing dicts in place.
+    """
+    degrees.people.clear()
+    degrees.movies.clear()
+    degrees.load_data(directory)
+
+
+def benchmark_frontiers(sizes=(1000, 4000, 16000, 64000), expansions=1000):
+    """
+    Time one BFS expansion step (remove, membership check, add)
+    on frontiers of increasing size.
+    """
+    for name, frontier_class in [("QueueFrontier", QueueFrontier), ("DequeFrontier", degrees.DequeFrontier)]:
+        for size in sizes:
+            frontier = frontier_class()
+            for state in range(size):
+                frontier.add(Node(state=state, parent=None, action=None))
+
+            start = time.perf_counter()
+            for state in range(size, size + expansions):
+                frontier.remove()
+                if not frontier.contains_state(state):
+                    frontier.add(Node(state=state, parent=None, action=None))
+            elapsed = time.perf_counter() - start
+            print(f"{name:>14} size {size:>6}: {elapsed / expansions * 1e6:.2f}us per expansion")
+
+
+def benchmark_degrees(graph, queries, seed=0):
+    """
+    Time each shortest path search over the same random
+    (source, target) pairs and check that they agree on path length.
+    """
+    rng = random.Random(seed)
+    person_ids = sorted(degrees.people)
+    # Draw sources from a small pool so that queries share sources
+    sources = [rng.choice(person_ids) for _ in range(max(1, queries // 10))]
+    pairs = [
+        (rng.choice(sources), rng.choice(person_ids))
+        for _ in range(queries)
+    ]
+
+    searches = [
+        ("bfs", degrees.shortest_path),
+        ("bidirectional", degrees.shortest_path_bidirectional),
+        ("compact", graph.shortest_path),
+        ("source index", graph.shortest_path_from_index),
+    ]
+    lengths = {}
+    for name, search in searches:
+        start = time.perf_counter()
+        lengths[name] = [path_length(search(source, target)) for source, target in pairs]
+        elapsed = time.perf_counter() - start
+        print(f"{name:>14}: {elapsed:.3f}s total, {elapsed / queries * 1000:.2f}ms per query")
+
+    # Self-queries are reported differently by the original search, so skip them
+    for i, (source, target) in enumerate(pairs):
+        if source == target:
+            continue
+        expected = lengths["bfs"][i]
+        for name in lengths:
+            if lengths[name][i] != expected:
+                print(f"Mismatch for {source} -> {target}: {name} found {lengths[name][i]}, expected {expected}")
+
+
+def benchmark_tictactoe(games=2):
+    benchmark_tictactoe_moves(games)
+    benchmark_tictactoe_engines()
+
+
+def benchmark_tictactoe_moves(games):
+    """
+    Play minimax against itself from the empty board, reporting
+    nodes searched and time taken for each move.
+    """
+
+    # Measure the search itself rather than opening book lookups
+    tictactoe.opening_book = False
+    tictactoe.transposition_table.clear()
+    for game in range(games):
+        board = tictactoe.initial_state()
+        print(f"Game {game + 1} ({'cold' if game == 0 else 'warm'} transposition table)")
+        move = 1
+        while not tictactoe.terminal(board):
+            action = tictactoe.minimax(board)
+            stats = tictactoe.last_search
+            print(f"  move {move} {action}: {stats['nodes']} nodes in {stats['seconds'] * 1000:.2f}ms")
+            board = tictactoe.result(board, action)
+            move += 1
+
+
+def benchmark_tictactoe_engines():
+    """
+    Compare nodes searched per second by the list and bitboard engines,
+    solving every position after the first two moves from scratch.
+    """
+    openings = []
+    for first in sorted(tictactoe.actions(tictactoe.initial_state())):
+        board = tictactoe.result(tictactoe.initial_state(), first)
+        for second in sorted(tictactoe.actions(board)):
+            openings.append(tictactoe.result(board, second))
+
+    for name, engine, convert in [("lists", tictactoe, list), ("bitboard", bitboard, bitboard.from_lists)]:
+        nodes = 0
+        seconds = 0
+        for board in openings:
+            engine.transposition_table.clear()
+            engine.minimax(convert(board))
+            nodes += engine.last_search["nodes"]
+            seconds += engine.last_search["seconds"]
+        print(f"{name:>9}: {nodes} nodes in {seconds:.3f}s, {nodes / seconds:,.0f} nodes/s")
+
+
+def benchmark_parallel(variants=((4, 4, 4, 9), (5, 5, 4, 7), (6, 6, 5, 6)), workers=(1, 2, 4, 8)):
+    """
+    Time the parallel root-split search on larger boards with 1, 2, 4
+    and 8 workers, checking it plays the same first move as the
+    sequential search to the same depth.
+    """
+    tictactoe.opening_book = False
+    for rows, columns, win_length, depth in variants:
+        tictactoe.configure(rows, columns, win_length)
+        board = tictactoe.initial_state()
+        print(f"{rows}x{columns}, {win_length} in a row, depth {depth}")
+
+        start = time.perf_counter()
+        expected = tictactoe.Search(board, math.inf).best_move(depth)
+        expected = divmod(expected, columns)
+        sequential = time.perf_counter() - start
+        print(f"  sequential: {expected} in {sequential:.2f}s")
+
+        for count in workers:
+            with tictactoe.ParallelSearch(count) as search:
+                move = search.best_move(board, depth)
+            elapsed = tictactoe.last_search["seconds"]
+            check = "" if move == expected else f" (expected {expected})"
+            print(f"  {count} workers: {move}{check} in {elapsed:.2f}s, speedup {sequential / elapsed:.2f}x")
+    tictactoe.configure()
+
+
+def path_length(path):
+    return None if path is None else len(path)
+
+
+if __name__ == "__main__":
+    main()
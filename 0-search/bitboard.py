@@ -0,0 +1,241 @@
+"""
+Tic Tac Toe Player using bitboards
+
+A board is a pair of 9-bit integers (x, o) marking the cells taken by
+each player, where cell (i, j) is bit 3 * i + j.
+"""
+
+import math
+import time
+
+X = "X"
+O = "O"
+EMPTY = None
+
+FULL = 0b111111111
+
+# Bit masks of each winning line
+WIN_MASKS = [
+    0b000000111, 0b000111000, 0b111000000,
+    0b001001001, 0b010010010, 0b100100100,
+    0b100010001, 0b001010100
+]
+
+# The 8 rotations and reflections of the board, as index permutations
+SYMMETRIES = [
+    (0, 1, 2, 3, 4, 5, 6, 7, 8),
+    (6, 3, 0, 7, 4, 1, 8, 5, 2),
+    (8, 7, 6, 5, 4, 3, 2, 1, 0),
+    (2, 5, 8, 1, 4, 7, 0, 3, 6),
+    (2, 1, 0, 5, 4, 3, 8, 7, 6),
+    (6, 7, 8, 3, 4, 5, 0, 1, 2),
+    (0, 3, 6, 1, 4, 7, 2, 5, 8),
+    (8, 5, 2, 7, 4, 1, 6, 3, 0)
+]
+
+# For each symmetry, maps every 9-bit mask to its transformed mask
+SYMMETRY_TABLES = [
+    [
+        sum(1 << i for i in range(9) if bits >> symmetry[i] & 1)
+        for bits in range(FULL + 1)
+    ]
+    for symmetry in SYMMETRIES
+]
+
+# Kinds of value stored in the transposition table
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+# Maps canonical (x, o) boards to (value, kind of value), shared across moves
+transposition_table = {}
+
+# Nodes searched and time taken by the most recent call to minimax
+last_search = {"nodes": 0, "seconds": 0.0}
+
+
+def initial_state():
+    """
+    Returns starting state of the board.
+    """
+    return (0, 0)
+
+
+def from_lists(board):
+    """
+    Returns the bitboard for a board of nested lists, as used by tictactoe.
+    """
+    x = o = 0
+    for i, row in enumerate(board):
+        for j, cell in enumerate(row):
+            if cell == X:
+                x |= 1 << (3 * i + j)
+            elif cell == O:
+                o |= 1 << (3 * i + j)
+    return (x, o)
+
+
+def to_lists(board):
+    """
+    Returns a board of nested lists, as used by tictactoe, for a bitboard.
+    """
+    x, o = board
+    return [
+        [X if x >> (3 * i + j) & 1 else O if o >> (3 * i + j) & 1 else EMPTY for j in range(3)]
+        for i in range(3)
+    ]
+
+
+def player(board):
+    """
+    Returns player who has the next turn on a board.
+    """
+    x, o = board
+    return X if x.bit_count() <= o.bit_count() else O
+
+
+def actions(board):
+    """
+    Returns set of all possible actions (i, j) available on the board.
+    """
+    taken = board[0] | board[1]
+    return {divmod(index, 3) for index in range(9) if not taken >> index & 1}
+
+
+def result(board, action):
+    """
+    Returns the board that results from making move (i, j) on the board.
+    """
+    i, j = action
+    bit = 1 << (3 * i + j)
+    x, o = board
+    if not (0 <= i < 3 and 0 <= j < 3) or (x | o) & bit:
+        raise Exception("Invalid action")
+    if player(board) == X:
+        return (x | bit, o)
+    return (x, o | bit)
+
+
+def has_line(bits):
+    for mask in WIN_MASKS:
+        if bits & mask == mask:
+            return True
+    return False
+
+
+def winner(board):
+    """
+    Returns the winner of the game, if there is one.
+    """
+    if has_line(board[0]):
+        return X
+    if has_line(board[1]):
+        return O
+    return None
+
+
+def terminal(board):
+    """
+    Returns True if game is over, False otherwise.
+    """
+    return winner(board) is not None or board[0] | board[1] == FULL
+
+
+def utility(board):
+    """
+    Returns 1 if X has won the game, -1 if O has won, 0 otherwise.
+    """
+    player_who_won = winner(board)
+    if player_who_won == X:
+        return 1
+    if player_who_won == O:
+        return -1
+    return 0
+
+
+def minimax(board):
+    """
+    Returns the optimal action for the current player on the board.
+    """
+    start = time.perf_counter()
+    last_search["nodes"] = 0
+
+    if terminal(board):
+        return None
+
+    x, o = board
+    maximising = player(board) == X
+    alpha, beta = -math.inf, math.inf
+    optimal_move = None
+
+    for index in range(9):
+        bit = 1 << index
+        if (x | o) & bit:
+            continue
+        if maximising:
+            value = alpha_beta(x | bit, o, alpha, beta)
+            if value > alpha:
+                alpha, optimal_move = value, divmod(index, 3)
+        else:
+            value = alpha_beta(x, o | bit, alpha, beta)
+            if value < beta:
+                beta, optimal_move = value, divmod(index, 3)
+
+    last_search["seconds"] = time.perf_counter() - start
+    return optimal_move
+
+
+def alpha_beta(x, o, alpha, beta):
+    """
+    Returns the minimax value of the board (x, o), searching with
+    alpha-beta pruning and caching bounds in the transposition table.
+    """
+    last_search["nodes"] += 1
+
+    for mask in WIN_MASKS:
+        if x & mask == mask:
+            return 1
+        if o & mask == mask:
+            return -1
+    taken = x | o
+    if taken == FULL:
+        return 0
+
+    # Look up the canonical board, which is shared by all 8 symmetries
+    key = min((table[x], table[o]) for table in SYMMETRY_TABLES)
+    entry = transposition_table.get(key)
+    if entry is not None:
+        value, flag = entry
+        if flag == EXACT:
+            return value
+        if flag == LOWER_BOUND:
+            alpha = max(alpha, value)
+        else:
+            beta = min(beta, value)
+        if alpha >= beta:
+            return value
+
+    original_alpha, original_beta = alpha, beta
+    maximising = x.bit_count() <= o.bit_count()
+    value = -math.inf if maximising else math.inf
+
+    for index in range(9):
+        bit = 1 << index
+        if taken & bit:
+            continue
+        if maximising:
+            value = max(value, alpha_beta(x | bit, o, alpha, beta))
+            alpha = max(alpha, value)
+        else:
+            value = min(value, alpha_beta(x, o | bit, alpha, beta))
+            beta = min(beta, value)
+        if alpha >= beta:
+            break
+
+    if value <= original_alpha:
+        transposition_table[key] = (value, UPPER_BOUND)
+    elif value >= original_beta:
+        transposition_table[key] = (value, LOWER_BOUND)
+    else:
+        transposition_table[key] = (value, EXACT)
+    return value
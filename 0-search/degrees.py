@@ -1,10 +1,20 @@
+import argparse
 import csv
+import json
+import mmap
+import os
+import re
+import struct
 import sys
+import zlib
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
 
-from util import Node, StackFrontier, QueueFrontier
-
-# Maps names to a set of corresponding person_ids
-names = {}
+from util import Node, StackFrontier
 
 # Maps person_ids to a dictionary of: name, birth, movies (a set of movie_ids)
 people = {}
@@ -12,6 +22,60 @@ people = {}
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
+# Prefix and fuzzy lookup over the names of `people`, built by load_data
+name_index = None
+
+# Fuzzy lookups find names within this many single-character edits
+# (or swaps of adjacent characters)
+FUZZY_EDITS = 1
+
+# Minimum trigram similarity for a fuzzy match to be used in place of an exact one
+FUZZY_THRESHOLD = 0.4
+
+# Ways to pick one person when several share a name, without prompting
+AMBIGUITY_POLICIES = ["prompt", "error", "oldest", "youngest"]
+
+# Number of single-source BFS indexes each CompactGraph keeps cached
+SOURCE_INDEX_CACHE_SIZE = 16
+
+# Binary snapshot of a CompactGraph, stored next to the CSV files
+SNAPSHOT_FILENAME = "degrees.snapshot"
+SNAPSHOT_MAGIC = b"DEGREES\0"
+SNAPSHOT_VERSION = 3
+
+# Magic, version, array item size, CSV signature (size and mtime of each file),
+# people, movies, edge, distinct name and name variant counts, then byte
+# lengths of the seven string tables
+SNAPSHOT_HEADER = struct.Struct("<8sII6q5q7q")
+
+
+class DequeFrontier():
+    """
+    Queue frontier with constant-time removal and membership checks,
+    keeping a set of the states currently in the frontier.
+    """
+
+    def __init__(self):
+        self.frontier = deque()
+        self.states = set()
+
+    def add(self, node):
+        self.frontier.append(node)
+        self.states.add(node.state)
+
+    def contains_state(self, state):
+        return state in self.states
+
+    def empty(self):
+        return len(self.frontier) == 0
+
+    def remove(self):
+        if self.empty():
+            raise Exception("empty frontier")
+        node = self.frontier.popleft()
+        self.states.discard(node.state)
+        return node
+
 
 def load_data(directory):
     """
@@ -26,11 +90,9 @@ def load_data(directory):
                 "birth": row["birth"],
                 "movies": set()
             }
-            if row["name"].lower() not in names:
-                names[row["name"].lower()] = {row["id"]}
-            else:
-                names[row["name"].lower()].add(row["id"])
 
+    global name_index
+    name_index = NameIndex((person_id, person["name"]) for person_id, person in people.items())
 
     # Load movies
     with open(f"{directory}/movies.csv", encoding="utf-8") as f:
@@ -53,24 +115,565 @@ def load_data(directory):
                 pass
 
 
+class NameIndex():
+    """
+    Case-insensitive index over people's names, supporting exact,
+    prefix and fuzzy (trigram similarity) lookups.
+
+    The people named sorted_names[p] are person_ids[i] for each i in
+    people[offsets[p]:offsets[p + 1]]. Fuzzy lookups use `variants`, the
+    sorted `variant_hash(variant) << 32 | p` of every variant of each name
+    with up to FUZZY_EDITS characters deleted: two names within that many
+    edits share a variant. Everything is kept in arrays so a snapshot can
+    store the whole index instead of building it again.
+    """
+
+    def __init__(self, entries=()):
+
+        # Group positions in person_ids by lowercase name
+        self.person_ids = []
+        groups = {}
+        for person_id, name in entries:
+            groups.setdefault(name.lower(), []).append(len(self.person_ids))
+            self.person_ids.append(person_id)
+        self.sorted_names = sorted(groups)
+        self.offsets = array("l", [0])
+        self.people = array("l")
+        for name in self.sorted_names:
+            self.people.extend(groups[name])
+            self.offsets.append(len(self.people))
+
+        # Hash every variant of every name, sorted so lookups can bisect
+        variants = []
+        for position, name in enumerate(self.sorted_names):
+            variants.extend([key << 32 | position for key in map(variant_hash, deletions(name, FUZZY_EDITS))])
+        variants.sort()
+        self.variants = array("Q", variants)
+
+    @classmethod
+    def from_arrays(cls, person_ids, sorted_names, offsets, people, variants):
+        """
+        Returns a NameIndex over arrays already in its layout, such as
+        those read from a snapshot.
+        """
+        index = cls()
+        index.person_ids = person_ids
+        index.sorted_names = sorted_names
+        index.offsets = offsets
+        index.people = people
+        index.variants = variants
+        return index
+
+    def exact(self, name):
+        name = name.lower()
+        position = bisect_left(self.sorted_names, name)
+        if position == len(self.sorted_names) or self.sorted_names[position] != name:
+            return []
+        start, end = self.offsets[position], self.offsets[position + 1]
+        return [self.person_ids[person] for person in self.people[start:end]]
+
+    def prefix(self, prefix, limit=10):
+        """
+        Returns up to `limit` names starting with `prefix`, in sorted order.
+        """
+        prefix = prefix.lower()
+        matches = []
+        position = bisect_left(self.sorted_names, prefix)
+        while (position < len(self.sorted_names) and len(matches) < limit
+               and self.sorted_names[position].startswith(prefix)):
+            matches.append(self.sorted_names[position])
+            position += 1
+        return matches
+
+    def fuzzy(self, name, limit=5):
+        """
+        Returns up to `limit` (similarity, name) pairs for the names most
+        similar to `name`, best first.
+        """
+        name = name.lower()
+        query = trigrams(name)
+
+        # Names sharing a hash with one of the query's variants; a hash
+        # collision only adds a candidate that scores poorly
+        candidates = set()
+        variants = self.variants
+        for variant in deletions(name, FUZZY_EDITS):
+            key = variant_hash(variant)
+            i = bisect_left(variants, key << 32)
+            while i < len(variants) and variants[i] >> 32 == key:
+                candidates.add(variants[i] & 0xFFFFFFFF)
+                i += 1
+
+        scored = []
+        for position in candidates:
+            candidate = self.sorted_names[position]
+            candidate_trigrams = trigrams(candidate)
+            shared = len(query & candidate_trigrams)
+            scored.append((shared / (len(query) + len(candidate_trigrams) - shared), candidate))
+        scored.sort(key=lambda match: (-match[0], match[1]))
+        return scored[:limit]
+
+
+def deletions(name, edits):
+    """
+    Returns the set of strings made by deleting up to `edits` characters from `name`.
+    """
+    variants = {name}
+    for _ in range(edits):
+        variants |= {
+            variant[:i] + variant[i + 1:] for variant in variants for i in range(len(variant))
+        }
+    return variants
+
+
+def variant_hash(variant):
+    """
+    Returns a 32-bit hash of `variant` that is the same in every process,
+    unlike hash(), so that it can be stored in a snapshot.
+    """
+    return zlib.crc32(variant.encode("utf-8"))
+
+
+def trigrams(name):
+    """
+    Returns the set of three-character substrings of a padded name.
+    """
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class CompactGraph():
+    """
+    People/movies graph with IMDB ids interned to dense integers.
+    Adjacency is stored in CSR form: the movies of person `p` are
+    `person_movies[person_offsets[p]:person_offsets[p + 1]]`, and
+    likewise the stars of movie `m` are stored in `movie_people`.
+    """
+
+    def __init__(self):
+        self.person_ids = []
+        self.person_names = []
+        self.person_births = []
+        self.movie_ids = []
+        self.movie_titles = []
+        self.movie_years = []
+
+        # Maps IMDB ids to their dense integer index
+        self.person_index = {}
+        self.movie_index = {}
+
+        self.person_offsets = array("l", [0])
+        self.person_movies = array("l")
+        self.movie_offsets = array("l", [0])
+        self.movie_people = array("l")
+
+        # NameIndex over person_names, read from the snapshot or built by load_compact_data
+        self.names = None
+
+        # Keeps a memory-mapped snapshot open while its arrays are in use
+        self.snapshot = None
+
+        # Maps source person indices to their SourceIndex, least recently used first
+        self.source_indexes = OrderedDict()
+
+    def build_adjacency(self, edges_person, edges_movie):
+        """
+        Fill both CSR adjacency arrays from parallel arrays of
+        (person index, movie index) edges using a counting sort.
+        """
+        self.person_offsets, self.person_movies = csr_from_edges(
+            len(self.person_ids), edges_person, edges_movie
+        )
+        self.movie_offsets, self.movie_people = csr_from_edges(
+            len(self.movie_ids), edges_movie, edges_person
+        )
+
+    def name_index(self):
+        """
+        Returns the NameIndex over this graph's people, building it
+        unless it was read from a snapshot.
+        """
+        if self.names is None:
+            self.names = NameIndex(zip(self.person_ids, self.person_names))
+        return self.names
+
+    def person_ids_for_name(self, name):
+        """
+        Returns the IMDB ids of everyone with the given name.
+        """
+        return self.name_index().exact(name)
+
+    def person(self, person_id):
+        person = self.person_index[person_id]
+        return {"name": self.person_names[person], "birth": self.person_births[person]}
+
+    def movie(self, movie_id):
+        movie = self.movie_index[movie_id]
+        return {"title": self.movie_titles[movie], "year": self.movie_years[movie]}
+
+    def movies_for(self, person):
+        return self.person_movies[self.person_offsets[person]:self.person_offsets[person + 1]]
+
+    def stars_for(self, movie):
+        return self.movie_people[self.movie_offsets[movie]:self.movie_offsets[movie + 1]]
+
+    def shortest_path(self, source, target):
+        """
+        Returns the shortest list of (movie_id, person_id) pairs
+        that connect the source to the target, given IMDB ids.
+        If no possible path, returns None.
+        """
+        source = self.person_index[source]
+        target = self.person_index[target]
+        if source == target:
+            return []
+
+        parent_person = array("l", [-1]) * len(self.person_ids)
+        parent_movie = array("l", [-1]) * len(self.person_ids)
+        movie_seen = bytearray(len(self.movie_ids))
+        parent_person[source] = source
+
+        person_offsets, person_movies = self.person_offsets, self.person_movies
+        movie_offsets, movie_people = self.movie_offsets, self.movie_people
+
+        layer = [source]
+        while layer:
+            next_layer = []
+            for person in layer:
+                for movie in person_movies[person_offsets[person]:person_offsets[person + 1]]:
+
+                    # Each movie only needs to be expanded once in the whole search
+                    if movie_seen[movie]:
+                        continue
+                    movie_seen[movie] = 1
+
+                    for star in movie_people[movie_offsets[movie]:movie_offsets[movie + 1]]:
+                        if parent_person[star] != -1:
+                            continue
+                        parent_person[star] = person
+                        parent_movie[star] = movie
+                        if star == target:
+                            return self._path_to(target, source, parent_person, parent_movie)
+                        next_layer.append(star)
+            layer = next_layer
+
+        return None
+
+    def source_index(self, source):
+        """
+        Returns the SourceIndex for a BFS from the IMDB id `source`
+        over the whole graph, reusing a cached one if available.
+        """
+        source = self.person_index[source]
+        if source in self.source_indexes:
+            self.source_indexes.move_to_end(source)
+            return self.source_indexes[source]
+
+        index = SourceIndex(self, source)
+        self.source_indexes[source] = index
+        if len(self.source_indexes) > SOURCE_INDEX_CACHE_SIZE:
+            self.source_indexes.popitem(last=False)
+        return index
+
+    def shortest_path_from_index(self, source, target):
+        """
+        Same as `shortest_path`, but answered by walking the parent
+        pointers of the (cached) SourceIndex for `source`.
+        """
+        index = self.source_index(source)
+        target = self.person_index[target]
+        if index.distance[target] == -1:
+            return None
+        return self._path_to(target, index.source, index.parent_person, index.parent_movie)
+
+    def _path_to(self, target, source, parent_person, parent_movie):
+        path = []
+        person = target
+        while person != source:
+            path.append((self.movie_ids[parent_movie[person]], self.person_ids[person]))
+            person = parent_person[person]
+        path.reverse()
+        return path
+
+
+class SourceIndex():
+    """
+    Distances and BFS-tree parents from one source person to everyone
+    in a CompactGraph; -1 marks people who cannot be reached.
+    """
+
+    def __init__(self, graph, source):
+        self.source = source
+        self.distance = array("h", [-1]) * len(graph.person_ids)
+        self.parent_person = array("i", [-1]) * len(graph.person_ids)
+        self.parent_movie = array("i", [-1]) * len(graph.person_ids)
+        movie_seen = bytearray(len(graph.movie_ids))
+
+        person_offsets, person_movies = graph.person_offsets, graph.person_movies
+        movie_offsets, movie_people = graph.movie_offsets, graph.movie_people
+
+        self.distance[source] = 0
+        self.parent_person[source] = source
+        layer = [source]
+        depth = 0
+        while layer:
+            depth += 1
+            next_layer = []
+            for person in layer:
+                for movie in person_movies[person_offsets[person]:person_offsets[person + 1]]:
+                    if movie_seen[movie]:
+                        continue
+                    movie_seen[movie] = 1
+                    for star in movie_people[movie_offsets[movie]:movie_offsets[movie + 1]]:
+                        if self.distance[star] != -1:
+                            continue
+                        self.distance[star] = depth
+                        self.parent_person[star] = person
+                        self.parent_movie[star] = movie
+                        next_layer.append(star)
+            layer = next_layer
+
+
+def csr_from_edges(size, rows, columns):
+    """
+    Returns (offsets, indices) arrays for a CSR adjacency with `size`
+    rows, given parallel arrays of edge rows and columns.
+    """
+    offsets = array("l", [0]) * (size + 1)
+    for row in rows:
+        offsets[row + 1] += 1
+    for i in range(size):
+        offsets[i + 1] += offsets[i]
+
+    indices = array("l", [0]) * len(rows)
+    position = array("l", offsets[:-1])
+    for row, column in zip(rows, columns):
+        indices[position[row]] = column
+        position[row] += 1
+
+    return offsets, indices
+
+
+def load_compact_data(directory, cache=True):
+    """
+    Load data from CSV files into a CompactGraph.
+    If `cache` is set, reuse the binary snapshot next to the CSV files
+    when it matches them, and otherwise write a fresh one.
+    """
+    snapshot_path = os.path.join(directory, SNAPSHOT_FILENAME)
+    signature = csv_signature(directory)
+    if cache:
+        graph = read_snapshot(snapshot_path, signature)
+        if graph is not None:
+            return graph
+
+    graph = CompactGraph()
+
+    # Load people
+    with open(f"{directory}/people.csv", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            graph.person_index[row["id"]] = len(graph.person_ids)
+            graph.person_ids.append(row["id"])
+            graph.person_names.append(row["name"])
+            graph.person_births.append(row["birth"])
+
+    # Load movies
+    with open(f"{directory}/movies.csv", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            graph.movie_index[row["id"]] = len(graph.movie_ids)
+            graph.movie_ids.append(row["id"])
+            graph.movie_titles.append(row["title"])
+            graph.movie_years.append(row["year"])
+
+    # Load stars
+    edges_person = array("l")
+    edges_movie = array("l")
+    with open(f"{directory}/stars.csv", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            try:
+                person = graph.person_index[row["person_id"]]
+                movie = graph.movie_index[row["movie_id"]]
+            except KeyError:
+                continue
+            edges_person.append(person)
+            edges_movie.append(movie)
+
+    graph.build_adjacency(edges_person, edges_movie)
+    graph.name_index()
+
+    if cache:
+        try:
+            write_snapshot(graph, snapshot_path, signature)
+        except OSError:
+            pass
+
+    return graph
+
+
+def csv_signature(directory):
+    """
+    Returns the size and modification time of each CSV file,
+    used to tell whether a snapshot is still up to date.
+    """
+    signature = []
+    for filename in ("people.csv", "movies.csv", "stars.csv"):
+        stat = os.stat(os.path.join(directory, filename))
+        signature += [stat.st_size, stat.st_mtime_ns]
+    return signature
+
+
+def write_snapshot(graph, path, signature):
+    """
+    Write a CompactGraph to `path`: a fixed header, the four CSR arrays,
+    the three NameIndex arrays, then the NUL-separated string tables.
+    """
+    names = graph.name_index()
+    tables = [
+        "\0".join(table).encode("utf-8")
+        for table in (graph.person_ids, graph.person_names, graph.person_births,
+                      graph.movie_ids, graph.movie_titles, graph.movie_years,
+                      names.sorted_names)
+    ]
+    header = SNAPSHOT_HEADER.pack(
+        SNAPSHOT_MAGIC, SNAPSHOT_VERSION, graph.person_offsets.itemsize, *signature,
+        len(graph.person_ids), len(graph.movie_ids), len(graph.person_movies),
+        len(names.sorted_names), len(names.variants), *[len(table) for table in tables]
+    )
+
+    # Write to a temporary file first so readers never see a partial snapshot
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, "wb") as f:
+            f.write(header)
+            for values in (graph.person_offsets, graph.person_movies,
+                           graph.movie_offsets, graph.movie_people,
+                           names.offsets, names.people, names.variants):
+                f.write(values.tobytes())
+            for table in tables:
+                f.write(table)
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+def read_snapshot(path, signature):
+    """
+    Memory-map a snapshot written by `write_snapshot` into a CompactGraph.
+    Returns None if there is no snapshot or it does not match `signature`.
+    """
+    try:
+        with open(path, "rb") as f:
+            snapshot = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    if len(snapshot) < SNAPSHOT_HEADER.size:
+        return None
+    magic, version, itemsize, *fields = SNAPSHOT_HEADER.unpack_from(snapshot)
+    if (magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION
+            or itemsize != array("l").itemsize or fields[:6] != signature):
+        return None
+    people_count, movies_count, edges_count, names_count, variants_count, *table_lengths = fields[6:]
+
+    view = memoryview(snapshot)
+    offset = SNAPSHOT_HEADER.size
+
+    def take(length):
+        nonlocal offset
+        section = view[offset:offset + length]
+        offset += length
+        return section
+
+    graph = CompactGraph()
+    graph.snapshot = snapshot
+    graph.person_offsets = take((people_count + 1) * itemsize).cast("l")
+    graph.person_movies = take(edges_count * itemsize).cast("l")
+    graph.movie_offsets = take((movies_count + 1) * itemsize).cast("l")
+    graph.movie_people = take(edges_count * itemsize).cast("l")
+    name_offsets = take((names_count + 1) * itemsize).cast("l")
+    name_people = take(people_count * itemsize).cast("l")
+    name_variants = take(variants_count * 8).cast("Q")
+
+    tables = [take(length) for length in table_lengths]
+    (graph.person_ids, graph.person_names, graph.person_births,
+     graph.movie_ids, graph.movie_titles, graph.movie_years, sorted_names) = [
+        bytes(table).decode("utf-8").split("\0") if count else []
+        for table, count in zip(tables, [people_count] * 3 + [movies_count] * 3 + [names_count])
+    ]
+    graph.names = NameIndex.from_arrays(graph.person_ids, sorted_names, name_offsets, name_people, name_variants)
+
+    graph.person_index = {person_id: i for i, person_id in enumerate(graph.person_ids)}
+    graph.movie_index = {movie_id: i for i, movie_id in enumerate(graph.movie_ids)}
+    return graph
+
+
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "small"
+    parser = argparse.ArgumentParser(description="Find degrees of separation between two people.")
+    parser.add_argument("directory", nargs="?", default="small")
+    search = parser.add_mutually_exclusive_group()
+    search.add_argument("--bidirectional", action="store_true",
+                        help="search from both people at once")
+    search.add_argument("--compact", action="store_true",
+                        help="use the compact, snapshot-cached graph")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--batch", metavar="FILE", nargs="?", const="-",
+                      help="answer CSV name pairs from FILE (or stdin) as JSON lines")
+    mode.add_argument("--serve", metavar="PORT", type=int,
+                      help="answer queries over HTTP on localhost:PORT")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="worker processes used by --serve")
+    parser.add_argument("--ambiguous", choices=AMBIGUITY_POLICIES,
+                        help="how to pick between people who share a name "
+                             "(default: prompt, or error with --batch and --serve)")
+    args = parser.parse_args()
+    directory = args.directory
+
+    if args.serve is not None or args.batch is not None:
+        policy = args.ambiguous or "error"
+        if policy == "prompt":
+            parser.error("--ambiguous prompt cannot be used with --batch or --serve")
+    else:
+        policy = args.ambiguous or "prompt"
+
+    if args.serve is not None:
+        serve(directory, args.serve, args.workers, policy)
+        return
+
+    if args.batch is not None:
+        graph = load_compact_data(directory)
+        if args.batch == "-":
+            run_batch(graph, sys.stdin, sys.stdout, policy)
+        else:
+            with open(args.batch, encoding="utf-8") as f:
+                run_batch(graph, f, sys.stdout, policy)
+        return
 
     # Load data from files into memory
     print("Loading data...")
-    load_data(directory)
+    graph = None
+    if args.compact:
+        graph = load_compact_data(directory)
+    else:
+        load_data(directory)
     print("Data loaded.")
 
-    source = person_id_for_name(input("Name: "))
+    source = person_id_for_name(input("Name: "), graph, policy)
     if source is None:
         sys.exit("Person not found.")
-    target = person_id_for_name(input("Name: "))
+    target = person_id_for_name(input("Name: "), graph, policy)
     if target is None:
         sys.exit("Person not found.")
 
-    path = shortest_path(source, target)
+    if graph is not None:
+        path = graph.shortest_path(source, target)
+    elif args.bidirectional:
+        path = shortest_path_bidirectional(source, target)
+    else:
+        path = shortest_path(source, target)
 
     if path is None:
         print("Not connected.")
@@ -79,12 +682,150 @@ def main():
         print(f"{degrees} degrees of separation.")
         path = [(None, source)] + path
         for i in range(degrees):
-            person1 = people[path[i][1]]["name"]
-            person2 = people[path[i + 1][1]]["name"]
-            movie = movies[path[i + 1][0]]["title"]
+            if graph is None:
+                person1 = people[path[i][1]]["name"]
+                person2 = people[path[i + 1][1]]["name"]
+                movie = movies[path[i + 1][0]]["title"]
+            else:
+                person1 = graph.person(path[i][1])["name"]
+                person2 = graph.person(path[i + 1][1])["name"]
+                movie = graph.movie(path[i + 1][0])["title"]
             print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
 
+def query(graph, source_name, target_name, policy="error", use_source_index=False):
+    """
+    Answers one degrees-of-separation query between two names
+    without prompting, as a JSON-serialisable dictionary.
+    Names shared by several people are resolved according to `policy`.
+    If `use_source_index` is set, the path is read from the graph's cached
+    SourceIndex for the source, which pays off when many queries share a
+    source; otherwise the search stops as soon as the target is found.
+    """
+    answer = {"source": source_name, "target": target_name}
+    person_ids = []
+    for role, name in (("source", source_name), ("target", target_name)):
+        candidates = candidate_person_ids(name, graph)
+        if len(candidates) == 0:
+            answer["error"] = f"Person not found: {name}"
+            return answer
+        person_id = choose_person_id(candidates, policy, graph)
+        if person_id is None:
+            answer["error"] = f"Ambiguous name: {name}"
+            answer["candidates"] = [
+                {"id": person_id, **graph.person(person_id)} for person_id in candidates
+            ]
+            return answer
+
+        # The name may have been matched approximately, so say who was used
+        answer[f"{role}_person"] = {"id": person_id, **graph.person(person_id)}
+        person_ids.append(person_id)
+
+    if use_source_index:
+        path = graph.shortest_path_from_index(*person_ids)
+    else:
+        path = graph.shortest_path(*person_ids)
+    if path is None:
+        answer["degrees"] = None
+        answer["path"] = None
+    else:
+        answer["degrees"] = len(path)
+        answer["path"] = [
+            {
+                "movie_id": movie_id,
+                "title": graph.movie(movie_id)["title"],
+                "person_id": person_id,
+                "name": graph.person(person_id)["name"],
+            }
+            for movie_id, person_id in path
+        ]
+    return answer
+
+
+def run_batch(graph, lines, output, policy="error"):
+    """
+    Reads `source,target` name pairs in CSV form from `lines`
+    and writes one JSON answer per pair to `output`.
+    A source index costs a full search of the graph, so it is only built
+    once a source comes up again; first queries stop at their target.
+    """
+    sources = set()
+    for row in csv.reader(lines):
+        if not row:
+            continue
+        if len(row) != 2:
+            answer = {"error": f"Expected two names, got: {','.join(row)}"}
+        else:
+            source_name, target_name = row[0].strip(), row[1].strip()
+            repeated = source_name.lower() in sources
+            sources.add(source_name.lower())
+            answer = query(graph, source_name, target_name, policy, use_source_index=repeated)
+        output.write(json.dumps(answer) + "\n")
+        output.flush()
+
+
+# Graph loaded once by each server worker process, and its ambiguity policy
+worker_graph = None
+worker_policy = "error"
+
+
+def load_worker_graph(directory, policy):
+    global worker_graph, worker_policy
+    worker_graph = load_compact_data(directory)
+    worker_policy = policy
+
+
+def worker_query(source_name, target_name):
+    return query(worker_graph, source_name, target_name, worker_policy)
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """
+    Answers `GET /?source=NAME&target=NAME` with a JSON body,
+    handing the search itself to the server's worker pool.
+    """
+
+    def do_GET(self):
+        parameters = parse_qs(urlparse(self.path).query)
+        try:
+            source_name = parameters["source"][0]
+            target_name = parameters["target"][0]
+        except KeyError:
+            self.send_json(400, {"error": "Expected source and target parameters"})
+            return
+        answer = self.server.pool.submit(worker_query, source_name, target_name).result()
+        self.send_json(200, answer)
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def serve(directory, port, workers, policy="error"):
+    """
+    Serve queries over HTTP on localhost until interrupted, keeping the
+    graph loaded in `workers` processes that answer queries concurrently.
+    """
+
+    # Build the snapshot up front so workers only need to memory-map it
+    load_compact_data(directory)
+
+    with ProcessPoolExecutor(workers, initializer=load_worker_graph, initargs=(directory, policy)) as pool:
+        server = ThreadingHTTPServer(("127.0.0.1", port), QueryHandler)
+        server.pool = pool
+        print(f"Serving on http://127.0.0.1:{port}/ with {workers} workers")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+
 def shortest_path(source, target):
     """
     Returns the shortest list of (movie_id, person_id) pairs
@@ -94,7 +835,7 @@ def shortest_path(source, target):
 
     # Initialise the frontier to the starting position
     start = Node(state=source, parent=None, action=None)
-    frontier = QueueFrontier()
+    frontier = DequeFrontier()
     frontier.add(start)
 
     # Initialise an empty explored set
@@ -134,18 +875,101 @@ def shortest_path(source, target):
                 frontier.add(child)
 
 
-def person_id_for_name(name):
+def shortest_path_bidirectional(source, target):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs
+    that connect the source to the target, searching breadth-first
+    from both ends at once and always expanding the smaller side.
+    If no possible path, returns None.
+    """
+    if source == target:
+        return []
+
+    # Map each reached person to the (movie_id, person_id) step that reached them
+    forward_parents = {source: None}
+    backward_parents = {target: None}
+    forward_layer = [source]
+    backward_layer = [target]
+
+    while forward_layer and backward_layer:
+
+        # Expand whichever side currently has the smaller frontier
+        expanding_forward = len(forward_layer) <= len(backward_layer)
+        if expanding_forward:
+            layer, parents, other_parents = forward_layer, forward_parents, backward_parents
+        else:
+            layer, parents, other_parents = backward_layer, backward_parents, forward_parents
+
+        next_layer = []
+        meetings = []
+        for person_id in layer:
+            for movie_id, neighbour in neighbors_for_person(person_id):
+                if neighbour in parents:
+                    continue
+                parents[neighbour] = (movie_id, person_id)
+                next_layer.append(neighbour)
+                if neighbour in other_parents:
+                    meetings.append(neighbour)
+
+        # Finish the whole layer before stopping, so the shortest meeting point wins
+        if meetings:
+            paths = [
+                _join_paths(meeting, forward_parents, backward_parents)
+                for meeting in meetings
+            ]
+            return min(paths, key=len)
+
+        if expanding_forward:
+            forward_layer = next_layer
+        else:
+            backward_layer = next_layer
+
+    return None
+
+
+def _join_paths(meeting, forward_parents, backward_parents):
+    """
+    Returns the (movie_id, person_id) path from the source to the target
+    that passes through `meeting`, given the parents found by each side.
+    """
+    path = []
+    person_id = meeting
+    while forward_parents[person_id] is not None:
+        movie_id, previous = forward_parents[person_id]
+        path.append((movie_id, person_id))
+        person_id = previous
+    path.reverse()
+
+    person_id = meeting
+    while backward_parents[person_id] is not None:
+        movie_id, following = backward_parents[person_id]
+        path.append((movie_id, following))
+        person_id = following
+
+    return path
+
+
+def person_id_for_name(name, graph=None, policy="prompt"):
     """
     Returns the IMDB id for a person's name,
     resolving ambiguities as needed.
+    Looks the name up in `graph` if given, or in `name_index` otherwise.
     """
-    person_ids = list(names.get(name.lower(), set()))
+    person_ids = candidate_person_ids(name, graph)
     if len(person_ids) == 0:
         return None
+
+    # Say when the closest name was used instead of the one typed
+    matched_name = person_for_id(person_ids[0], graph)["name"]
+    if matched_name.lower() != split_birth_year(name)[0].lower():
+        print(f"Using '{matched_name}'")
+
+    if len(person_ids) > 1 and policy != "prompt":
+        return choose_person_id(person_ids, policy, graph)
     elif len(person_ids) > 1:
         print(f"Which '{name}'?")
         for person_id in person_ids:
-            person = people[person_id]
+            person = person_for_id(person_id, graph)
             name = person["name"]
             birth = person["birth"]
             print(f"ID: {person_id}, Name: {name}, Birth: {birth}")
@@ -160,6 +984,65 @@ def person_id_for_name(name):
         return person_ids[0]
 
 
+def candidate_person_ids(name, graph=None):
+    """
+    Returns the IMDB ids that a typed name may refer to: exact matches,
+    or else the people with the closest matching name.
+    A trailing birth year, as in "Emma Watson (1990)", narrows the match.
+    """
+    index = name_index if graph is None else graph.name_index()
+    name, birth = split_birth_year(name)
+
+    person_ids = index.exact(name)
+    if not person_ids:
+        matches = index.fuzzy(name, limit=1)
+        if matches and matches[0][0] >= FUZZY_THRESHOLD:
+            person_ids = index.exact(matches[0][1])
+
+    if birth is not None:
+        person_ids = [
+            person_id for person_id in person_ids
+            if person_for_id(person_id, graph)["birth"] == birth
+        ]
+    return person_ids
+
+
+def split_birth_year(name):
+    """
+    Returns (name, birth) for a typed name with an optional trailing
+    birth year, as in "Emma Watson (1990)"; birth is None without one.
+    """
+    match = re.fullmatch(r"(.*?)\s*\((\d{4})\)\s*", name)
+    if match:
+        return match.group(1), match.group(2)
+    return name, None
+
+
+def choose_person_id(person_ids, policy, graph=None):
+    """
+    Picks one of several IMDB ids sharing a name according to `policy`,
+    without prompting. Returns None if the policy cannot decide.
+    """
+    if len(person_ids) == 1:
+        return person_ids[0]
+    if policy not in ("oldest", "youngest"):
+        return None
+
+    # People with a known birth year come first, ties broken by id
+    def birth_key(person_id):
+        birth = person_for_id(person_id, graph)["birth"]
+        if not birth.isdigit():
+            return (1, 0, person_id)
+        year = int(birth) if policy == "oldest" else -int(birth)
+        return (0, year, person_id)
+
+    return min(person_ids, key=birth_key)
+
+
+def person_for_id(person_id, graph=None):
+    return people[person_id] if graph is None else graph.person(person_id)
+
+
 def neighbors_for_person(person_id):
     """
     Returns (movie_id, person_id) pairs for people
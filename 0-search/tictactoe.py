@@ -1,22 +1,156 @@
 """
 Tic Tac Toe Player
+
+Also plays m,n,k-games: any board size and number in a row to win,
+set with `configure`.
 """
 
 import math
 import copy
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 
 X = "X"
 O = "O"
 EMPTY = None
 
+# Board dimensions and the number of marks in a row needed to win
+ROWS = 3
+COLUMNS = 3
+WIN_LENGTH = 3
+
+# Seconds minimax may search before playing the best move found so far
+TIME_BUDGET = 1.0
+
+# Search score of a win, to which the remaining depth is added so that
+# faster wins (and slower losses) are preferred
+WIN_SCORE = 1000000
+
+# Kinds of value stored in the transposition table
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+# Maps canonical boards to (value, kind of value, depth searched), shared across moves
+transposition_table = {}
+
+# Size at which the transposition table is cleared before the next search
+TRANSPOSITION_TABLE_LIMIT = 2000000
+
+# Nodes searched, depth completed and time taken by the most recent call to minimax
+last_search = {"nodes": 0, "depth": 0, "seconds": 0.0}
+
+# Perfect-play table for the standard 3x3 game written by `write_opening_book`,
+# with one byte per board indexed by `board_key`: 3 * (3 * i + j) + (value + 1)
+# for the best move (i, j), or NO_ENTRY for terminal and unreachable boards
+BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tictactoe.book")
+BOOK_MAGIC = b"TTTBOOK1"
+NO_ENTRY = 255
+
+# Contents of the opening book once loaded, or False if it is unavailable
+opening_book = None
+
+# Maps (rows, columns, win length) to their Geometry
+geometries = {}
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class Geometry():
+    """
+    Winning lines, symmetries and move order of a board, with cells
+    numbered 0 to rows * columns - 1 in row-major order.
+    """
+
+    def __init__(self, rows, columns, win_length):
+        self.rows = rows
+        self.columns = columns
+        self.size = rows * columns
+
+        # Every run of `win_length` cells along a row, column or diagonal
+        self.lines = []
+        for i in range(rows):
+            for j in range(columns):
+                for di, dj in [(0, 1), (1, 0), (1, 1), (1, -1)]:
+                    end_i = i + di * (win_length - 1)
+                    end_j = j + dj * (win_length - 1)
+                    if 0 <= end_i < rows and 0 <= end_j < columns:
+                        self.lines.append(tuple(
+                            (i + di * k) * columns + j + dj * k for k in range(win_length)
+                        ))
+
+        # The lines through each cell, so a move only needs its own lines checked
+        self.lines_through = [[] for _ in range(self.size)]
+        for line in self.lines:
+            for index in line:
+                self.lines_through[index].append(line)
+
+        # Reflections, plus rotations and transposes if the board is square,
+        # as permutations mapping each cell to the cell it is copied from
+        transforms = [
+            lambda i, j: (i, j),
+            lambda i, j: (i, columns - 1 - j),
+            lambda i, j: (rows - 1 - i, j),
+            lambda i, j: (rows - 1 - i, columns - 1 - j),
+        ]
+        if rows == columns:
+            transforms += [
+                lambda i, j: (j, i),
+                lambda i, j: (j, columns - 1 - i),
+                lambda i, j: (rows - 1 - j, i),
+                lambda i, j: (rows - 1 - j, columns - 1 - i),
+            ]
+        self.symmetries = []
+        for transform in transforms:
+            permutation = [0] * self.size
+            for i in range(rows):
+                for j in range(columns):
+                    source_i, source_j = transform(i, j)
+                    permutation[i * columns + j] = source_i * columns + source_j
+            self.symmetries.append(tuple(permutation))
+
+        # Rank of each cell when ordering moves, central cells first
+        centre_i, centre_j = (rows - 1) / 2, (columns - 1) / 2
+        by_centre = sorted(
+            range(self.size),
+            key=lambda index: (abs(index // columns - centre_i) + abs(index % columns - centre_j), index)
+        )
+        self.centre_rank = [0] * self.size
+        for rank, index in enumerate(by_centre):
+            self.centre_rank[index] = rank
+
+
+def geometry_for(board):
+    """
+    Returns the Geometry of a board's size with the configured win length.
+    """
+    key = (len(board), len(board[0]), WIN_LENGTH)
+    if key not in geometries:
+        geometries[key] = Geometry(*key)
+    return geometries[key]
+
+
+def configure(rows=3, columns=3, win_length=3, time_budget=1.0):
+    """
+    Sets the board size, number in a row needed to win, and seconds
+    minimax may spend on each move.
+    """
+    global ROWS, COLUMNS, WIN_LENGTH, TIME_BUDGET
+    if not 1 <= win_length <= max(rows, columns):
+        raise ValueError("win_length must fit on the board")
+    ROWS, COLUMNS, WIN_LENGTH, TIME_BUDGET = rows, columns, win_length, time_budget
+    transposition_table.clear()
+
 
 def initial_state():
     """
     Returns starting state of the board.
     """
-    return [[EMPTY, EMPTY, EMPTY],
-            [EMPTY, EMPTY, EMPTY],
-            [EMPTY, EMPTY, EMPTY]]
+    return [[EMPTY] * COLUMNS for _ in range(ROWS)]
 
 
 def player(board):
@@ -72,25 +206,13 @@ def winner(board):
     """
     Returns the winner of the game, if there is one.
     """
-    for player in (X, O):
-
-        # Check vertical columns for three in a row
-        for row in board:
-            if row == [player] * 3:
-                return player
+    cells = [cell for row in board for cell in row]
 
-        # Check horizontal rows for three in a row
-        for i in range(3):
-            column = [board[x][i] for x in range(3)]
-            if column == [player] * 3:
-                return player
-        
-        # Check diagonals for three in a row
-        if [board[i][i] for i in range(0, 3)] == [player] * 3:
-            return player
-
-        elif [board[i][~i] for i in range(0, 3)] == [player] * 3:
-            return player
+    # Check every row, column and diagonal for WIN_LENGTH in a row
+    for line in geometry_for(board).lines:
+        first = cells[line[0]]
+        if first is not EMPTY and all(cells[index] == first for index in line):
+            return first
 
     return None
 
@@ -130,38 +252,379 @@ def minimax(board):
     """
     Returns the optimal action for the current player on the board.
     """
-    
-    def calculate_max_value(board):
-        optimal_move = ()
-        if terminal(board):
-            return utility(board), optimal_move
+    start = time.perf_counter()
+    last_search["nodes"] = 0
+    last_search["depth"] = 0
+
+    if terminal(board):
+        return None
+
+    # Answer straight from the opening book when it is available
+    entry = book_entry(board)
+    if entry is not None:
+        last_search["seconds"] = time.perf_counter() - start
+        return entry[0]
+
+    if len(transposition_table) > TRANSPOSITION_TABLE_LIMIT:
+        transposition_table.clear()
+
+    search = Search(board, start + TIME_BUDGET)
+    index = search.best_move()
+
+    last_search["nodes"] = search.nodes
+    last_search["depth"] = search.depth
+    last_search["seconds"] = time.perf_counter() - start
+    return divmod(index, len(board[0]))
+
+
+class Search():
+    """
+    Iterative-deepening alpha-beta search from one board, stopping at
+    a deadline. Works on a flat list of cells updated in place.
+    """
+
+    def __init__(self, board, deadline):
+        self.geometry = geometry_for(board)
+        self.cells = [cell for row in board for cell in row]
+        self.deadline = deadline
+        self.nodes = 0
+        self.depth = 0
+
+        # Moves that caused cutoffs, weighted by depth, are tried first
+        self.history = [0] * self.geometry.size
+
+    def best_move(self, max_depth=None):
+        """
+        Returns the index of the best move found by searching one ply
+        deeper each time until the game is solved, `max_depth` is
+        reached or time runs out.
+        """
+        moves = self.ordered_moves()
+        empties = len(moves)
+        best = moves[0]
+
+        for depth in range(1, min(empties, max_depth or empties) + 1):
+            try:
+                value, best = self.search_root(moves, depth)
+            except SearchTimeout:
+                break
+            self.depth = depth
+
+            # Search the best move first in the next iteration
+            moves.remove(best)
+            moves.insert(0, best)
+
+            if abs(value) >= WIN_SCORE:
+                break
+
+        return best
+
+    def search_root(self, moves, depth):
+        cells = self.cells
+        maximising = (self.geometry.size - len(moves)) % 2 == 0
+        mark = X if maximising else O
+        alpha, beta = -math.inf, math.inf
+        best = None
+
+        for index in moves:
+            cells[index] = mark
+            try:
+                value = self.alpha_beta(depth - 1, alpha, beta, index, len(moves) - 1)
+            finally:
+                cells[index] = EMPTY
+            if maximising and value > alpha:
+                alpha, best = value, index
+            elif not maximising and value < beta:
+                beta, best = value, index
+
+        return (alpha if maximising else beta), best
+
+    def alpha_beta(self, depth, alpha, beta, last, empties):
+        """
+        Returns the value of the current cells for X, `last` being the
+        cell just played, searching `depth` more plies with alpha-beta
+        pruning and caching bounds in the transposition table.
+        """
+        self.nodes += 1
+        if self.nodes & 1023 == 0 and time.perf_counter() > self.deadline:
+            raise SearchTimeout
+
+        # Only lines through the last move can have just been completed
+        cells = self.cells
+        mark = cells[last]
+        for line in self.geometry.lines_through[last]:
+            if all(cells[index] == mark for index in line):
+                return WIN_SCORE + depth if mark == X else -WIN_SCORE - depth
+        if empties == 0:
+            return 0
+        if depth == 0:
+            return self.evaluate()
+
+        # Look up the canonical board, which is shared by all its symmetries.
+        # Entries are only reused at the depth they were searched to, so that
+        # values do not depend on search order and parallel searches agree
+        key = min(tuple(cells[i] or "" for i in symmetry) for symmetry in self.geometry.symmetries)
+        entry = transposition_table.get(key)
+        if entry is not None and entry[2] == depth:
+            value, flag, _ = entry
+            if flag == EXACT:
+                return value
+            if flag == LOWER_BOUND:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+            if alpha >= beta:
+                return value
+
+        original_alpha, original_beta = alpha, beta
+        maximising = (self.geometry.size - empties) % 2 == 0
+        mark = X if maximising else O
+        value = -math.inf if maximising else math.inf
+
+        for index in self.ordered_moves():
+            cells[index] = mark
+            try:
+                child_value = self.alpha_beta(depth - 1, alpha, beta, index, empties - 1)
+            finally:
+                cells[index] = EMPTY
+            if maximising:
+                value = max(value, child_value)
+                alpha = max(alpha, value)
+            else:
+                value = min(value, child_value)
+                beta = min(beta, value)
+            if alpha >= beta:
+                self.history[index] += depth * depth
+                break
+
+        if value <= original_alpha:
+            transposition_table[key] = (value, UPPER_BOUND, depth)
+        elif value >= original_beta:
+            transposition_table[key] = (value, LOWER_BOUND, depth)
         else:
-            v = -100
-            for action in actions(board):
-                min_value = calculate_min_value(result(board, action))[0]
-                if min_value > v:
-                    v = min_value
-                    optimal_move = action
-            return v, optimal_move
-
-    def calculate_min_value(board):
-        optimal_move = ()
-        if terminal(board):
-            return utility(board), optimal_move
+            transposition_table[key] = (value, EXACT, depth)
+        return value
+
+    def ordered_moves(self):
+        """
+        Returns the empty cells, best history score first and then
+        closest to the centre.
+        """
+        history = self.history
+        centre_rank = self.geometry.centre_rank
+        moves = [index for index, cell in enumerate(self.cells) if cell is EMPTY]
+        moves.sort(key=lambda index: (-history[index], centre_rank[index]))
+        return moves
+
+    def evaluate(self):
+        """
+        Returns a heuristic value for X of an unfinished board: every line
+        still open to only one player scores 10 to the power of the number
+        of marks that player has in it.
+        """
+        cells = self.cells
+        score = 0
+        for line in self.geometry.lines:
+            x_count = o_count = 0
+            for index in line:
+                if cells[index] == X:
+                    x_count += 1
+                elif cells[index] == O:
+                    o_count += 1
+            if o_count == 0 and x_count:
+                score += 10 ** x_count
+            elif x_count == 0 and o_count:
+                score -= 10 ** o_count
+
+        # Keep heuristic scores below the score of a win
+        return max(-WIN_SCORE + 1, min(WIN_SCORE - 1, score))
+
+
+class ParallelSearch():
+    """
+    Searches root moves in parallel across a pool of worker processes,
+    which share the best value found so far at the root as a bound.
+    For a fixed depth, returns the same move as the sequential Search.
+    """
+
+    def __init__(self, workers=None):
+        self.bound = multiprocessing.Value("q", 0)
+        self.pool = ProcessPoolExecutor(
+            workers,
+            initializer=start_search_worker,
+            initargs=(self.bound, ROWS, COLUMNS, WIN_LENGTH)
+        )
+
+    def close(self):
+        self.pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+    def best_move(self, board, depth=None):
+        """
+        Returns the best action (i, j) for the current player, deepening
+        one ply at a time up to `depth` (by default, the end of the game).
+        """
+        start = time.perf_counter()
+        cells = [cell for row in board for cell in row]
+
+        # Order root moves exactly as a fresh sequential Search would
+        moves = Search(board, math.inf).ordered_moves()
+        best = moves[0]
+        last_search["nodes"] = 0
+
+        for iteration in range(1, min(len(moves), depth or len(moves)) + 1):
+            with self.bound.get_lock():
+                self.bound.value = -2 ** 62
+            futures = [
+                self.pool.submit(search_root_move, cells, index, iteration)
+                for index in moves
+            ]
+            results = [future.result() for future in futures]
+            last_search["nodes"] += sum(nodes for _, _, nodes in results)
+
+            # The earliest move with the best exact score wins ties, as in Search
+            best_score = max(score for score, exact, _ in results if exact)
+            best = next(
+                index for index, (score, exact, _) in zip(moves, results)
+                if exact and score == best_score
+            )
+            last_search["depth"] = iteration
+
+            moves.remove(best)
+            moves.insert(0, best)
+            if best_score >= WIN_SCORE:
+                break
+
+        last_search["seconds"] = time.perf_counter() - start
+        return divmod(best, len(board[0]))
+
+
+# Best score for the player to move at the root, shared by search workers
+shared_bound = None
+
+
+def start_search_worker(bound, rows, columns, win_length):
+    global shared_bound, ROWS, COLUMNS, WIN_LENGTH
+    shared_bound = bound
+    ROWS, COLUMNS, WIN_LENGTH = rows, columns, win_length
+
+
+def search_root_move(cells, index, depth):
+    """
+    Returns (score, exact, nodes) for playing `index` from the root `cells`,
+    where the score is from the point of view of the player to move and
+    is only exact if it reached the shared bound. Raises the bound if the
+    move beats it.
+    """
+    board = [cells[i:i + COLUMNS] for i in range(0, len(cells), COLUMNS)]
+    search = Search(board, math.inf)
+    empties = search.cells.count(EMPTY)
+    maximising = (search.geometry.size - empties) % 2 == 0
+    sign = 1 if maximising else -1
+
+    # Search just below the bound so that ties with it are still exact
+    floor = shared_bound.value - 1
+    search.cells[index] = X if maximising else O
+    if maximising:
+        value = search.alpha_beta(depth - 1, floor, math.inf, index, empties - 1)
+    else:
+        value = search.alpha_beta(depth - 1, -math.inf, -floor, index, empties - 1)
+    score = sign * value
+    exact = score > floor
+
+    if exact:
+        with shared_bound.get_lock():
+            shared_bound.value = max(shared_bound.value, score)
+    return score, exact, search.nodes
+
+
+def board_key(board):
+    """
+    Returns the board read as a base-3 number, with EMPTY, X and O as 0, 1 and 2.
+    """
+    key = 0
+    for row in board:
+        for cell in row:
+            key = 3 * key + (0 if cell == EMPTY else 1 if cell == X else 2)
+    return key
+
+
+def book_entry(board):
+    """
+    Returns (optimal action, value) for the board from the opening book,
+    or None if the book is missing or has no entry for the board.
+    """
+    global opening_book
+    if len(board) != 3 or len(board[0]) != 3 or WIN_LENGTH != 3:
+        return None
+    if opening_book is None:
+        try:
+            with open(BOOK_PATH, "rb") as f:
+                contents = f.read()
+        except OSError:
+            contents = b""
+        if contents[:len(BOOK_MAGIC)] == BOOK_MAGIC and len(contents) == len(BOOK_MAGIC) + 3 ** 9:
+            opening_book = contents[len(BOOK_MAGIC):]
         else:
-            v = 100
-            for action in actions(board):
-                max_value = calculate_max_value(result(board, action))[0]
-                if max_value < v:
-                    v = max_value
-                    optimal_move = action
-            return v, optimal_move
+            opening_book = False
+    if not opening_book:
+        return None
+
+    try:
+        entry = opening_book[board_key(board)]
+    except IndexError:
+        return None
+    if entry == NO_ENTRY:
+        return None
+    move, value = divmod(entry, 3)
+    return divmod(move, 3), value - 1
 
-    current_player = player(board)
 
+def solve(board, solutions):
+    """
+    Returns the minimax value of the board, recording (optimal action, value)
+    in `solutions` for every non-terminal board reachable from it.
+    """
+    key = board_key(board)
+    if key in solutions:
+        return solutions[key][1]
     if terminal(board):
-        return None
-    if current_player == X:
-        return calculate_max_value(board)[1]
-    else:
-        return calculate_min_value(board)[1]
+        return utility(board)
+
+    maximising = player(board) == X
+    optimal_move, optimal_value = None, None
+    for action in sorted(actions(board)):
+        value = solve(result(board, action), solutions)
+        if optimal_value is None or (value > optimal_value if maximising else value < optimal_value):
+            optimal_move, optimal_value = action, value
+
+    solutions[key] = (optimal_move, optimal_value)
+    return optimal_value
+
+
+def write_opening_book(path=BOOK_PATH):
+    """
+    Solve every position reachable from the initial state and write the
+    optimal action and value for each one to the opening book at `path`.
+    """
+    if (ROWS, COLUMNS, WIN_LENGTH) != (3, 3, 3):
+        raise ValueError("the opening book is only for the standard 3x3 game")
+    solutions = {}
+    solve(initial_state(), solutions)
+
+    book = bytearray([NO_ENTRY]) * 3 ** 9
+    for key, ((i, j), value) in solutions.items():
+        book[key] = 3 * (3 * i + j) + value + 1
+    with open(path, "wb") as f:
+        f.write(BOOK_MAGIC + bytes(book))
+    return len(solutions)
+
+
+if __name__ == "__main__":
+    positions = write_opening_book()
+    print(f"Wrote {positions} positions to {BOOK_PATH}")
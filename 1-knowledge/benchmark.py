@@ -0,0 +1,118 @@
+import argparse
+import importlib
+import os
+import random
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Board presets as (height, width, mines)
+PRESETS = {
+    "beginner": (9, 9, 10),
+    "intermediate": (16, 16, 40),
+    "expert": (16, 30, 99),
+    "huge": (100, 100, 1500),
+}
+
+# Number of groups of moves to report knowledge base size over
+KNOWLEDGE_BUCKETS = 10
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play MinesweeperAI against seeded games without the pygame runner.")
+    parser.add_argument("games", nargs="?", type=int, default=100, help="games per preset")
+    parser.add_argument("--presets", nargs="+", choices=PRESETS, default=["beginner", "intermediate", "expert"])
+    parser.add_argument("--engine", choices=["minesweeper", "bitsweeper"], default="minesweeper")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game")
+    args = parser.parse_args()
+
+    with ProcessPoolExecutor(args.workers) as pool:
+        for preset in args.presets:
+            games = [(args.engine, preset, args.seed + game) for game in range(args.games)]
+            results = list(pool.map(play, games, chunksize=max(1, args.games // (4 * args.workers))))
+            report(preset, results)
+
+
+def play(game):
+    """
+    Plays one seeded game and returns its outcome, the number of moves,
+    the time spent choosing and learning from moves, the latency of each
+    add_knowledge call, and the knowledge base size after each move.
+    """
+    engine, preset, seed = game
+    module = importlib.import_module(engine)
+    height, width, mines = PRESETS[preset]
+
+    random.seed(seed)
+    board = module.Minesweeper(height, width, mines)
+    ai = module.MinesweeperAI(height, width, mines)
+
+    latencies = []
+    knowledge_sizes = []
+    moves = 0
+    won = False
+    start = time.perf_counter()
+    while True:
+        move = ai.make_safe_move()
+        if move is None:
+            move = ai.make_random_move()
+        if move is None or board.is_mine(move):
+            break
+
+        moves += 1
+        count = board.nearby_mines(move)
+        added = time.perf_counter()
+        ai.add_knowledge(move, count)
+        latencies.append(time.perf_counter() - added)
+        knowledge_sizes.append(len(ai.knowledge))
+
+        if moves == height * width - mines:
+            won = True
+            break
+
+    return {
+        "won": won,
+        "moves": moves,
+        "seconds": time.perf_counter() - start,
+        "latencies": latencies,
+        "knowledge_sizes": knowledge_sizes,
+    }
+
+
+def report(preset, results):
+    height, width, mines = PRESETS[preset]
+    wins = sum(result["won"] for result in results)
+    moves = sum(result["moves"] for result in results)
+    seconds = sum(result["seconds"] for result in results)
+    latencies = sorted(latency for result in results for latency in result["latencies"])
+
+    print(f"{preset} ({height}x{width}, {mines} mines): {len(results)} games")
+    print(f"  win rate: {wins / len(results):.1%}")
+    print(f"  moves per second: {moves / seconds:,.0f}" if seconds else "  moves per second: n/a")
+    if latencies:
+        print(f"  add_knowledge latency: p50 {percentile(latencies, 50) * 1000:.3f}ms, "
+              f"p99 {percentile(latencies, 99) * 1000:.3f}ms, max {latencies[-1] * 1000:.3f}ms")
+
+    # Mean knowledge base size over the games still going at each point
+    print("  knowledge base size by move:")
+    longest = max(len(result["knowledge_sizes"]) for result in results)
+    bucket_size = max(1, -(-longest // KNOWLEDGE_BUCKETS))
+    for bucket in range(0, longest, bucket_size):
+        sizes = [
+            size
+            for result in results
+            for size in result["knowledge_sizes"][bucket:bucket + bucket_size]
+        ]
+        print(f"    moves {bucket + 1}-{bucket + bucket_size}: mean {statistics.mean(sizes):.1f}, max {max(sizes)}")
+
+
+def percentile(values, percent):
+    """
+    Returns the value below which `percent` percent of the sorted `values` lie.
+    """
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+if __name__ == "__main__":
+    main()
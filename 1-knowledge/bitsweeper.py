@@ -0,0 +1,275 @@
+"""
+Minesweeper game and AI using bitsets
+
+Cell (i, j) is numbered i * width + j, and a set of cells is an integer
+with the bits of those numbers set. Public methods take and return
+(i, j) cells as in minesweeper; attributes holding cells are bitsets.
+Inference and mine probabilities are inherited from minesweeper, working
+on cell numbers, so only the representation of cells lives here.
+"""
+
+import random
+from functools import lru_cache
+
+import minesweeper
+
+
+@lru_cache(maxsize=None)
+def neighbour_masks(height, width):
+    """
+    Returns, for every cell number, the bitset of its neighbours.
+    """
+    masks = []
+    for i in range(height):
+        for j in range(width):
+            mask = 0
+            for x in range(max(0, i - 1), min(i + 2, height)):
+                for y in range(max(0, j - 1), min(j + 2, width)):
+                    if (x, y) != (i, j):
+                        mask |= 1 << (x * width + y)
+            masks.append(mask)
+    return masks
+
+
+def cell_numbers(bits):
+    """
+    Yields the cell numbers in a bitset, lowest first.
+    """
+    while bits:
+        lowest = bits & -bits
+        yield lowest.bit_length() - 1
+        bits ^= lowest
+
+
+class Minesweeper():
+    """
+    Minesweeper game representation
+    """
+
+    def __init__(self, height=8, width=8, mines=8):
+
+        # Set initial width, height, and number of mines
+        self.height = height
+        self.width = width
+        self.neighbours = neighbour_masks(height, width)
+
+        # Add mines randomly, with the same draws as minesweeper.Minesweeper
+        # so that a seed gives the same board in both
+        self.mine_bits = 0
+        placed = 0
+        while placed != mines:
+            bit = 1 << (random.randrange(height) * width + random.randrange(width))
+            if not self.mine_bits & bit:
+                self.mine_bits |= bit
+                placed += 1
+
+        # At first, player has found no mines
+        self.mines_found = set()
+
+    @property
+    def mines(self):
+        return {divmod(index, self.width) for index in cell_numbers(self.mine_bits)}
+
+    def print(self):
+        """
+        Prints a text-based representation
+        of where mines are located.
+        """
+        for i in range(self.height):
+            print("--" * self.width + "-")
+            for j in range(self.width):
+                if self.is_mine((i, j)):
+                    print("|X", end="")
+                else:
+                    print("| ", end="")
+            print("|")
+        print("--" * self.width + "-")
+
+    def is_mine(self, cell):
+        i, j = cell
+        return bool(self.mine_bits >> (i * self.width + j) & 1)
+
+    def nearby_mines(self, cell):
+        """
+        Returns the number of mines that are
+        within one row and column of a given cell,
+        not including the cell itself.
+        """
+        i, j = cell
+        return (self.mine_bits & self.neighbours[i * self.width + j]).bit_count()
+
+    def won(self):
+        """
+        Checks if all mines have been flagged.
+        """
+        return self.mines_found == self.mines
+
+
+class Sentence():
+    """
+    Logical statement about a Minesweeper game
+    A sentence consists of a bitset of board cells,
+    and a count of the number of those cells which are mines.
+    Iterating over a sentence yields the numbers of its cells.
+    Sentences hash by value, so must not be changed while in a set.
+    """
+
+    def __init__(self, cells, count):
+        self.cells = cells
+        self.count = count
+
+    def __eq__(self, other):
+        return self.cells == other.cells and self.count == other.count
+
+    def __hash__(self):
+        return hash((self.cells, self.count))
+
+    def __str__(self):
+        return f"{bin(self.cells)} = {self.count}"
+
+    def __iter__(self):
+        return cell_numbers(self.cells)
+
+    def __len__(self):
+        return self.cells.bit_count()
+
+    def known_mines(self):
+        """
+        Returns the bitset of all cells in self.cells known to be mines.
+        """
+        if self.cells.bit_count() == self.count:
+            return self.cells
+        return 0
+
+    def known_safes(self):
+        """
+        Returns the bitset of all cells in self.cells known to be safe.
+        """
+        if self.count == 0:
+            return self.cells
+        return 0
+
+    def mark_mine(self, index):
+        """
+        Updates internal knowledge representation given the fact that
+        the cell numbered `index` is known to be a mine.
+        """
+        bit = 1 << index
+        if self.cells & bit:
+            self.cells ^= bit
+            self.count -= 1
+
+    def mark_safe(self, index):
+        """
+        Updates internal knowledge representation given the fact that
+        the cell numbered `index` is known to be safe.
+        """
+        self.cells &= ~(1 << index)
+
+    def is_subset(self, other):
+        """
+        Returns whether this sentence's cells are a proper subset of `other`'s.
+        """
+        return self.cells & ~other.cells == 0 and self.cells != other.cells
+
+    def difference(self, other):
+        """
+        Returns the sentence about the cells of this sentence that are
+        not in `other`, whose cells must be a subset of this sentence's.
+        """
+        return Sentence(self.cells & ~other.cells, self.count - other.count)
+
+
+class MinesweeperAI(minesweeper.MinesweeperAI):
+    """
+    Minesweeper game player
+    Knowledge is indexed by cell number rather than (i, j).
+    """
+
+    def __init__(self, height=8, width=8, mines=None):
+        super().__init__(height, width, mines)
+        self.neighbours = neighbour_masks(height, width)
+        self.all_cells = (1 << (height * width)) - 1
+
+        # Bitsets of cells that have been clicked on, and known to be safe or mines
+        self.moves_made = 0
+        self.mines = 0
+        self.safes = 0
+
+    def mark_mine(self, cell):
+        """
+        Marks a cell as a mine, and updates all knowledge
+        to mark that cell as a mine as well.
+        """
+        i, j = cell
+        self.mark_mine_number(i * self.width + j)
+
+    def mark_safe(self, cell):
+        """
+        Marks a cell as safe, and updates all knowledge
+        to mark that cell as safe as well.
+        """
+        i, j = cell
+        self.mark_safe_number(i * self.width + j)
+
+    def mark_mine_number(self, index):
+        self.mines |= 1 << index
+        self.update_sentences(index, True)
+
+    def mark_safe_number(self, index):
+        self.safes |= 1 << index
+        self.update_sentences(index, False)
+
+    def mark_mines(self, cells):
+        for index in cell_numbers(cells):
+            self.mark_mine_number(index)
+
+    def mark_safes(self, cells):
+        for index in cell_numbers(cells):
+            self.mark_safe_number(index)
+
+    def add_knowledge(self, cell, count):
+        """
+        Called when the Minesweeper board tells us, for a given
+        safe cell, how many neighboring cells have mines in them.
+        Marks the cell as a safe move that has been made, adds a
+        sentence about its unknown neighbours, and then infers
+        everything that follows from the knowledge base.
+        """
+        i, j = cell
+        index = i * self.width + j
+        self.moves_made |= 1 << index
+        self.mark_safe_number(index)
+
+        neighbours = self.neighbours[index]
+        unknown = neighbours & ~self.safes & ~self.mines
+        self.add_sentence(Sentence(unknown, count - (neighbours & self.mines).bit_count()))
+
+        self.infer()
+
+    def make_safe_move(self):
+        """
+        Returns a safe cell to choose on the Minesweeper board.
+        The move must be known to be safe, and not already a move
+        that has been made.
+        """
+        candidates = self.safes & ~self.moves_made & ~self.mines
+        if not candidates:
+            return None
+        return divmod((candidates & -candidates).bit_length() - 1, self.width)
+
+    def make_random_move(self):
+        """
+        Returns a move to make on the Minesweeper board, among cells
+        that have not been chosen and are not known to be mines.
+        Chooses the cell least likely to be a mine given the knowledge
+        base, as in minesweeper.MinesweeperAI.
+        """
+        index = super().make_random_move()
+        return None if index is None else divmod(index, self.width)
+
+    def unknown_cells(self):
+        return set(cell_numbers(self.all_cells & ~self.moves_made & ~self.mines & ~self.safes))
+
+    def mines_known(self):
+        return self.mines.bit_count()
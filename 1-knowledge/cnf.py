@@ -0,0 +1,273 @@
+"""
+Entailment for logic sentences by compiling them to CNF and running DPLL
+
+A sentence is compiled with the Tseitin transformation, which names every
+connective with a fresh variable so the clauses grow linearly with the
+sentence rather than exponentially. Variables are positive integers and a
+literal is a variable or its negation, as in DIMACS. The knowledge base
+entails a query exactly when the knowledge base together with the negated
+query is unsatisfiable, which DPLL usually decides without visiting more
+than a handful of the 2^n models that model_check enumerates.
+"""
+
+from logic import And, Biconditional, Implication, Not, Or, Symbol
+
+
+class Formula():
+    """
+    A conjunction of clauses over integer variables, with a solver
+    that can be asked about it under different assumptions.
+    """
+
+    def __init__(self, sentence=None):
+
+        # Maps symbol names to their variables
+        self.variables = {}
+
+        # Number of variables, including those naming connectives
+        self.size = 0
+
+        # Clauses of two or more literals, and single literals that must hold
+        self.clauses = []
+        self.units = []
+
+        # Maps each literal to the clauses watching it
+        self.watches = {}
+
+        # Set when an empty clause is added
+        self.contradiction = False
+
+        # Maps compiled sentences to the literal that names them
+        self.literals = {}
+
+        if sentence is not None:
+            self.add(sentence)
+
+    def variable(self, name=None):
+        """
+        Returns the variable of the symbol called `name`, or a fresh
+        variable if `name` is None.
+        """
+        if name is not None and name in self.variables:
+            return self.variables[name]
+        self.size += 1
+        if name is not None:
+            self.variables[name] = self.size
+        self.watches[self.size] = []
+        self.watches[-self.size] = []
+        return self.size
+
+    def add_clause(self, clause):
+        """
+        Adds the disjunction of the literals in `clause`.
+        """
+        clause = list(dict.fromkeys(clause))
+        if any(-literal in clause for literal in clause):
+            return
+        if not clause:
+            self.contradiction = True
+        elif len(clause) == 1:
+            self.units.append(clause[0])
+        else:
+            self.watches[clause[0]].append(len(self.clauses))
+            self.watches[clause[1]].append(len(self.clauses))
+            self.clauses.append(clause)
+
+    def add(self, sentence):
+        """
+        Adds the clauses asserting that `sentence` is true.
+        """
+        if isinstance(sentence, And):
+            for conjunct in sentence.conjuncts:
+                self.add(conjunct)
+        elif isinstance(sentence, Or):
+            self.add_clause([self.literal(disjunct) for disjunct in sentence.disjuncts])
+        elif isinstance(sentence, Implication):
+            self.add_clause([-self.literal(sentence.antecedent), self.literal(sentence.consequent)])
+        else:
+            self.add_clause([self.literal(sentence)])
+
+    def literal(self, sentence):
+        """
+        Returns a literal that is true exactly when `sentence` is,
+        adding clauses defining any new variables it needs.
+        """
+        if isinstance(sentence, Symbol):
+            return self.variable(sentence.name)
+        if isinstance(sentence, Not):
+            return -self.literal(sentence.operand)
+        if sentence in self.literals:
+            return self.literals[sentence]
+
+        if isinstance(sentence, And):
+            operands = [self.literal(conjunct) for conjunct in sentence.conjuncts]
+            name = self.variable()
+            for operand in operands:
+                self.add_clause([-name, operand])
+            self.add_clause([name] + [-operand for operand in operands])
+        elif isinstance(sentence, Or):
+            operands = [self.literal(disjunct) for disjunct in sentence.disjuncts]
+            name = self.variable()
+            for operand in operands:
+                self.add_clause([name, -operand])
+            self.add_clause([-name] + operands)
+        elif isinstance(sentence, Implication):
+            antecedent = self.literal(sentence.antecedent)
+            consequent = self.literal(sentence.consequent)
+            name = self.variable()
+            self.add_clause([-name, -antecedent, consequent])
+            self.add_clause([name, antecedent])
+            self.add_clause([name, -consequent])
+        elif isinstance(sentence, Biconditional):
+            left = self.literal(sentence.left)
+            right = self.literal(sentence.right)
+            name = self.variable()
+            self.add_clause([-name, -left, right])
+            self.add_clause([-name, left, -right])
+            self.add_clause([name, left, right])
+            self.add_clause([name, -left, -right])
+        else:
+            raise TypeError(f"cannot compile {type(sentence).__name__}")
+
+        self.literals[sentence] = name
+        return name
+
+    def solve(self, assumptions=()):
+        """
+        Returns a model satisfying the clauses and the literals in
+        `assumptions`, as a list of truth values indexed by variable,
+        or None if there is no such model.
+        """
+        if self.contradiction:
+            return None
+
+        # Value of each variable: 1 true, -1 false, 0 unassigned
+        values = [0] * (self.size + 1)
+        trail = []
+
+        def assign(literal):
+            """
+            Assigns `literal` true, returning False if it is already false.
+            """
+            value = values[abs(literal)]
+            if value:
+                return (value > 0) == (literal > 0)
+            values[abs(literal)] = 1 if literal > 0 else -1
+            trail.append(literal)
+            return True
+
+        def propagate(start):
+            """
+            Assigns every literal forced by a clause with all but one of its
+            literals false, returning False if some clause becomes false.
+            """
+            clauses = self.clauses
+            watches = self.watches
+            head = start
+            while head < len(trail):
+                false = -trail[head]
+                head += 1
+                watching = watches[false]
+                i = 0
+                while i < len(watching):
+                    clause = clauses[watching[i]]
+
+                    # Keep the literal that just became false second
+                    if clause[0] == false:
+                        clause[0], clause[1] = clause[1], false
+                    other = clause[0]
+                    value = values[abs(other)]
+                    if value and (value > 0) == (other > 0):
+                        i += 1
+                        continue
+
+                    # Watch another literal that is not false, if there is one
+                    for k in range(2, len(clause)):
+                        literal = clause[k]
+                        value = values[abs(literal)]
+                        if not value or (value > 0) == (literal > 0):
+                            clause[1], clause[k] = literal, false
+                            watches[literal].append(watching[i])
+                            watching[i] = watching[-1]
+                            watching.pop()
+                            break
+                    else:
+                        if not assign(other):
+                            return False
+                        i += 1
+            return True
+
+        for literal in list(self.units) + list(assumptions):
+            if not assign(literal):
+                return None
+        if not propagate(0):
+            return None
+
+        # Decisions as (length of trail before it, literal, whether it was flipped)
+        decisions = []
+        variable = 1
+        while True:
+            while variable <= self.size and values[variable]:
+                variable += 1
+            if variable > self.size:
+                return [value > 0 for value in values]
+
+            decisions.append((len(trail), -variable, False))
+            assign(-variable)
+            start = len(trail) - 1
+            while not propagate(start):
+
+                # Undo decisions until one can be tried the other way round
+                while decisions:
+                    length, literal, flipped = decisions.pop()
+                    for undone in trail[length:]:
+                        values[abs(undone)] = 0
+                    del trail[length:]
+                    if not flipped:
+                        break
+                else:
+                    return None
+                decisions.append((length, -literal, True))
+                assign(-literal)
+                start = length
+                variable = min(variable, abs(literal))
+
+    def holds(self, literal, model):
+        """
+        Returns whether `literal` is true in `model`.
+        """
+        return model[abs(literal)] == (literal > 0)
+
+
+def entails(knowledge, query):
+    """
+    Checks if knowledge base entails query, like logic.model_check.
+    """
+    formula = Formula(knowledge)
+    return formula.solve([-formula.literal(query)]) is None
+
+
+def entailed(knowledge, queries):
+    """
+    Returns the queries that knowledge base entails, in order.
+
+    Only queries true in every model found so far can be entailed, so each
+    model the solver finds rules out all the queries false in it at once.
+    """
+    formula = Formula(knowledge)
+    literals = [formula.literal(query) for query in queries]
+    model = formula.solve()
+    if model is None:
+        return list(queries)
+
+    candidates = {literal for literal in literals if formula.holds(literal, model)}
+    result = []
+    for query, literal in zip(queries, literals):
+        if literal not in candidates:
+            continue
+        model = formula.solve([-literal])
+        if model is None:
+            result.append(query)
+        else:
+            candidates = {candidate for candidate in candidates if formula.holds(candidate, model)}
+    return result
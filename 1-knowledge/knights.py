@@ -0,0 +1,154 @@
+"""
+Random Knights and Knaves puzzles, and a benchmark of entailment backends
+
+Every character is a Knight, who always tells the truth, or a Knave, who
+always lies. A puzzle is generated from a hidden assignment of kinds, so
+it always has at least that one solution, and is written in the same
+Symbol/And/Or/Not/Implication vocabulary as puzzle.py.
+
+Usage: python knights.py [--characters N ...] [--output knights.csv]
+"""
+
+import argparse
+import csv
+import multiprocessing
+import random
+import string
+import time
+
+from logic import And, Implication, Not, Or, Symbol, model_check
+from cnf import entailed, entails
+
+# Entailment backends to compare, each called as backend(knowledge, queries)
+# and returning the queries entailed
+BACKENDS = {
+    "model_check": lambda knowledge, queries: [query for query in queries if model_check(knowledge, query)],
+    "dpll": lambda knowledge, queries: [query for query in queries if entails(knowledge, query)],
+    "dpll_batch": entailed,
+}
+
+# Seconds a backend may spend on one puzzle before it is stopped and
+# skipped for all larger puzzles
+BACKEND_TIME_LIMIT = 10
+
+
+def character_name(index):
+    """
+    Returns the name of the character numbered `index`: A to Z, then A1 to Z1 and so on.
+    """
+    letter = string.ascii_uppercase[index % 26]
+    return letter if index < 26 else f"{letter}{index // 26}"
+
+
+def generate(characters, statements, seed=None):
+    """
+    Returns a random puzzle with `characters` characters making `statements`
+    statements between them, as (knowledge, symbols, solution), where
+    `symbols` lists each character's Knight and Knave symbols and `solution`
+    is the set of symbols true in the hidden assignment.
+    """
+    rng = random.Random(seed)
+    names = [character_name(index) for index in range(characters)]
+    knight = {name: Symbol(f"{name} is a Knight") for name in names}
+    knave = {name: Symbol(f"{name} is a Knave") for name in names}
+    is_knight = {name: rng.random() < 0.5 for name in names}
+
+    knowledge = And()
+    for name in names:
+        knowledge.add(Or(knight[name], knave[name]))
+        knowledge.add(Not(And(knight[name], knave[name])))
+
+    for _ in range(statements):
+        speaker = rng.choice(names)
+        claim, truth = random_claim(rng, names, knight, knave, is_knight)
+
+        # Knights only say true things and Knaves only false ones
+        if truth != is_knight[speaker]:
+            claim = Not(claim)
+        knowledge.add(Implication(knight[speaker], claim))
+        knowledge.add(Implication(knave[speaker], Not(claim)))
+
+    symbols = [symbol for name in names for symbol in (knight[name], knave[name])]
+    solution = {knight[name] if is_knight[name] else knave[name] for name in names}
+    return knowledge, symbols, solution
+
+
+def random_claim(rng, names, knight, knave, is_knight):
+    """
+    Returns a random claim about one or two characters, and whether it is
+    true in the hidden assignment `is_knight`.
+    """
+    first, second = rng.choice(names), rng.choice(names)
+    kind = rng.randrange(5)
+    if kind == 0:
+        # "First is a knight."
+        return knight[first], is_knight[first]
+    if kind == 1:
+        # "First is a knave."
+        return knave[first], not is_knight[first]
+    if kind == 2:
+        # "First and second are both knaves."
+        return And(knave[first], knave[second]), not is_knight[first] and not is_knight[second]
+    if kind == 3:
+        # "First or second is a knight."
+        return Or(knight[first], knight[second]), is_knight[first] or is_knight[second]
+    # "First and second are the same kind."
+    same = Or(And(knight[first], knight[second]), And(knave[first], knave[second]))
+    return same, is_knight[first] == is_knight[second]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time entailment backends on random Knights and Knaves puzzles.")
+    parser.add_argument("--characters", nargs="+", type=int, default=[2, 3, 4, 5, 6, 7, 8, 12, 16, 24, 32, 48, 64])
+    parser.add_argument("--statements", type=float, default=2, help="statements per character")
+    parser.add_argument("--trials", type=int, default=5, help="puzzles per size")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="knights.csv")
+    args = parser.parse_args()
+
+    # Each backend runs in its own process so that it can be stopped when it takes too long
+    pools = {name: multiprocessing.Pool(1) for name in args.backends}
+    with open(args.output, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["backend", "characters", "statements", "trial", "seconds", "entailed", "solved"])
+        for characters in args.characters:
+            statements = round(args.statements * characters)
+            for trial in range(args.trials):
+                knowledge, symbols, solution = generate(characters, statements, seed=f"{args.seed}-{characters}-{trial}")
+                for name in list(pools):
+                    task = pools[name].apply_async(time_backend, (name, knowledge, symbols))
+                    try:
+                        seconds, entailed = task.get(BACKEND_TIME_LIMIT)
+                    except multiprocessing.TimeoutError:
+                        pools.pop(name).terminate()
+                        writer.writerow([name, characters, statements, trial, "", "", ""])
+                        print(f"{name}: {characters} characters, {statements} statements, trial {trial}: "
+                              f"over {BACKEND_TIME_LIMIT}s, skipping larger puzzles")
+                        continue
+
+                    # Every entailed symbol must be true in the hidden solution
+                    if not solution.issuperset(entailed):
+                        raise Exception(f"{name} entailed a false symbol")
+                    solved = len(entailed) == characters
+                    writer.writerow([name, characters, statements, trial, f"{seconds:.6f}", len(entailed), solved])
+                    print(f"{name}: {characters} characters, {statements} statements, trial {trial}: "
+                          f"{seconds * 1000:.2f}ms, {len(entailed)} entailed")
+                f.flush()
+
+    for pool in pools.values():
+        pool.close()
+
+
+def time_backend(name, knowledge, symbols):
+    """
+    Returns the seconds taken by backend `name` to check every symbol in
+    `symbols` against `knowledge`, and the symbols it found entailed.
+    """
+    start = time.perf_counter()
+    result = BACKENDS[name](knowledge, symbols)
+    return time.perf_counter() - start, result
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,16 @@
 import itertools
+import math
 import random
+import time
+from collections import deque
+from functools import lru_cache
+
+# Seconds make_random_move may spend enumerating mine configurations
+PROBABILITY_TIME_LIMIT = 0.1
+
+
+class EnumerationTimeout(Exception):
+    pass
 
 
 class Minesweeper():
@@ -89,6 +100,7 @@ class Sentence():
     Logical statement about a Minesweeper game
     A sentence consists of a set of board cells,
     and a count of the number of those cells which are mines.
+    Sentences hash by value, so must not be changed while in a set.
     """
 
     def __init__(self, cells, count):
@@ -98,9 +110,18 @@ class Sentence():
     def __eq__(self, other):
         return self.cells == other.cells and self.count == other.count
 
+    def __hash__(self):
+        return hash((frozenset(self.cells), self.count))
+
     def __str__(self):
         return f"{self.cells} = {self.count}"
 
+    def __iter__(self):
+        return iter(self.cells)
+
+    def __len__(self):
+        return len(self.cells)
+
     def known_mines(self):
         """
         Returns the set of all cells in self.cells known to be mines.
@@ -134,18 +155,38 @@ class Sentence():
         if cell in self.cells:
             self.cells.remove(cell)
 
+    def is_subset(self, other):
+        """
+        Returns whether this sentence's cells are a proper subset of `other`'s.
+        """
+        return self.cells < other.cells
+
+    def difference(self, other):
+        """
+        Returns the sentence about the cells of this sentence that are
+        not in `other`, whose cells must be a subset of this sentence's.
+        """
+        return Sentence(self.cells - other.cells, self.count - other.count)
+
 
 class MinesweeperAI():
     """
     Minesweeper game player
+
+    Inference and mine probabilities only rely on sentences being iterable
+    over hashable cells and on the methods marked as representation
+    specific, so bitsweeper can reuse them with cells numbered in bitsets.
     """
 
-    def __init__(self, height=8, width=8):
+    def __init__(self, height=8, width=8, mines=None):
 
         # Set initial height and width
         self.height = height
         self.width = width
 
+        # Total number of mines on the board, if known, used to weigh risks
+        self.total_mines = mines
+
         # Keep track of which cells have been clicked on
         self.moves_made = set()
 
@@ -153,8 +194,14 @@ class MinesweeperAI():
         self.mines = set()
         self.safes = set()
 
-        # List of sentences about the game known to be true
-        self.knowledge = []
+        # Set of distinct sentences about the game known to be true
+        self.knowledge = set()
+
+        # Maps each cell to the set of sentences that mention it
+        self.sentences_by_cell = {}
+
+        # Sentences that are new or have changed and need to be re-examined
+        self.pending = deque()
 
     def mark_mine(self, cell):
         """
@@ -162,8 +209,7 @@ class MinesweeperAI():
         to mark that cell as a mine as well.
         """
         self.mines.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_mine(cell)
+        self.update_sentences(cell, True)
 
     def mark_safe(self, cell):
         """
@@ -171,8 +217,90 @@ class MinesweeperAI():
         to mark that cell as safe as well.
         """
         self.safes.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_safe(cell)
+        self.update_sentences(cell, False)
+
+    def mark_mines(self, cells):
+        """
+        Marks every cell in a sentence's `cells` as a mine.
+        Representation specific.
+        """
+        for cell in cells:
+            self.mark_mine(cell)
+
+    def mark_safes(self, cells):
+        """
+        Marks every cell in a sentence's `cells` as safe.
+        Representation specific.
+        """
+        for cell in cells:
+            self.mark_safe(cell)
+
+    def update_sentences(self, cell, is_mine):
+        """
+        Updates every sentence mentioning `cell` now that it is known
+        to be a mine or safe.
+        """
+        for sentence in self.sentences_by_cell.pop(cell, set()):
+            self.remove_sentence(sentence)
+            if is_mine:
+                sentence.mark_mine(cell)
+            else:
+                sentence.mark_safe(cell)
+            self.add_sentence(sentence)
+
+    def add_sentence(self, sentence):
+        """
+        Adds a sentence to the knowledge base, unless it is empty or
+        an equal sentence is already known, and queues it for inference.
+        """
+        if not sentence.cells or sentence in self.knowledge:
+            return
+        self.knowledge.add(sentence)
+        for cell in sentence:
+            self.sentences_by_cell.setdefault(cell, set()).add(sentence)
+        self.pending.append(sentence)
+
+    def remove_sentence(self, sentence):
+        self.knowledge.discard(sentence)
+        for cell in sentence:
+            sentences = self.sentences_by_cell.get(cell)
+            if sentences is not None:
+                sentences.discard(sentence)
+                if not sentences:
+                    del self.sentences_by_cell[cell]
+
+    def infer(self):
+        """
+        Draws conclusions from pending sentences until nothing new
+        can be concluded: marks cells that a sentence determines, and
+        adds the difference of any two sentences where one's cells are
+        a subset of the other's. Only sentences sharing a cell with
+        a pending sentence are compared against it.
+        """
+        while self.pending:
+            sentence = self.pending.popleft()
+            if sentence not in self.knowledge:
+                continue
+
+            # A sentence that determines all of its cells is used up
+            mines = sentence.known_mines()
+            safes = sentence.known_safes()
+            if mines or safes:
+                self.remove_sentence(sentence)
+                self.mark_mines(mines)
+                self.mark_safes(safes)
+                continue
+
+            overlapping = set()
+            for cell in sentence:
+                overlapping |= self.sentences_by_cell[cell]
+            overlapping.discard(sentence)
+
+            for other in overlapping:
+                if other.is_subset(sentence):
+                    self.add_sentence(sentence.difference(other))
+                elif sentence.is_subset(other):
+                    self.add_sentence(other.difference(sentence))
 
     def add_knowledge(self, cell, count):
         """
@@ -195,39 +323,13 @@ class MinesweeperAI():
         # 2) Mark the cell as safe
         self.mark_safe(cell)
 
-        # Find all neighbours of the cell
+        # 3) Add a new sentence about the neighbours not yet known to be safe or mines
         neighbours = self.find_all_neighbors(cell)
+        unknown = neighbours - self.safes - self.mines
+        self.add_sentence(Sentence(unknown, count - len(neighbours & self.mines)))
 
-        # 3) Add a new sentence to the AI's knowledge base based on the value of 'cell' and 'count'
-        self.knowledge.append(Sentence(neighbours, count))
-
-        # 4) Mark any additional cells as safe or as mines if it can be concluded based on the AI's knowledge base
-        for sentence in self.knowledge:
-            for mine in sentence.known_mines():
-                self.mark_mine(mine)
-            for safe in sentence.known_safes():
-                self.mark_safe(safe)
-
-        # Remove empty knowledge sentences
-        for sentence in self.knowledge:
-            if sentence.cells == set():
-                self.knowledge.remove(sentence)
-
-        # 5) Add any new sentences to the AI's knowledge base if they can be inferred from existing knowledge
-        knowledge_to_add = []
-        new_sentence = Sentence(neighbours, count)
-        for sentence in self.knowledge:
-            if new_sentence.cells and sentence.cells != new_sentence.cells:
-                if sentence.cells.issubset(new_sentence.cells):
-                    knowledge_to_add.append(Sentence(new_sentence.cells-sentence.cells, new_sentence.count-sentence.count))
-                if new_sentence.cells.issubset(sentence.cells):
-                    knowledge_to_add.append(Sentence(sentence.cells-new_sentence.cells, sentence.count-new_sentence.count))
-        self.knowledge += knowledge_to_add
-
-        # Remove empty knowledge sentences
-        for sentence in self.knowledge:
-            if sentence.cells == set():
-                self.knowledge.remove(sentence)
+        # 4) and 5) Mark cells and add new sentences until nothing more can be inferred
+        self.infer()
 
     def make_safe_move(self):
         """
@@ -248,13 +350,227 @@ class MinesweeperAI():
         Should choose randomly among cells that:
             1) have not already been chosen, and
             2) are not known to be mines
+        Chooses the cell least likely to be a mine given the knowledge
+        base, falling back to a local estimate if working that out
+        takes longer than PROBABILITY_TIME_LIMIT.
         """
-        for i in range(self.height):
-            for j in range(self.width):
-                move = (i, j)
-                if move not in self.moves_made and move not in self.mines:
-                    return move
-        return None
+        probabilities = self.mine_probabilities()
+        if not probabilities:
+            return None
+        return min(probabilities, key=lambda cell: (probabilities[cell], cell))
+
+    def unknown_cells(self):
+        """
+        Returns the set of cells that have not been chosen and are not
+        known to be mines or safe.
+        Representation specific.
+        """
+        return {
+            (i, j) for i in range(self.height) for j in range(self.width)
+        } - self.moves_made - self.mines - self.safes
+
+    def mines_known(self):
+        """
+        Returns the number of cells known to be mines.
+        Representation specific.
+        """
+        return len(self.mines)
+
+    def mine_probabilities(self, time_limit=PROBABILITY_TIME_LIMIT):
+        """
+        Returns a dictionary mapping each cell that has not been chosen
+        and is not known to be a mine or safe to its probability of
+        being a mine.
+        """
+        unknown = self.unknown_cells()
+        if not unknown:
+            return {}
+
+        # Every cell in a sentence is indexed in sentences_by_cell
+        interior_cells = unknown - self.sentences_by_cell.keys()
+        interior = len(interior_cells)
+
+        try:
+            deadline = time.perf_counter() + time_limit
+            components = [
+                self.count_configurations(cells, sentences, deadline)
+                for cells, sentences in self.components()
+            ]
+        except EnumerationTimeout:
+            return self.estimate_probabilities(unknown)
+
+        # Weigh each total of frontier mines by the ways to place the rest
+        # inside; without a mine count, every configuration counts the same
+        if self.total_mines is None:
+            def weight(frontier_mines):
+                return 1
+        else:
+            remaining = self.total_mines - self.mines_known()
+
+            def weight(frontier_mines):
+                return ways_to_place(interior, remaining - frontier_mines)
+
+        probabilities = {}
+        for index, (cells, ways, mine_counts) in enumerate(components):
+
+            # Distribution of mines over all the other components combined
+            others = {0: 1}
+            for other_index, (_, other_ways, _) in enumerate(components):
+                if other_index != index:
+                    others = convolve(others, other_ways)
+
+            component_total = 0
+            cell_totals = dict.fromkeys(cells, 0)
+            for mines, count in ways.items():
+                for other_mines, other_count in others.items():
+                    w = other_count * weight(mines + other_mines)
+                    component_total += count * w
+                    for cell, mine_count in mine_counts[mines].items():
+                        cell_totals[cell] += mine_count * w
+            if component_total == 0:
+                return self.estimate_probabilities(unknown)
+            for cell in cells:
+                probabilities[cell] = cell_totals[cell] / component_total
+
+        # Expected share of mines among cells outside every sentence
+        if interior:
+            all_ways = {0: 1}
+            for _, ways, _ in components:
+                all_ways = convolve(all_ways, ways)
+            if self.total_mines is None:
+                expected = sum(probabilities.values()) / len(probabilities) if probabilities else 0.5
+            else:
+                total = sum(count * weight(mines) for mines, count in all_ways.items())
+                if total == 0:
+                    return self.estimate_probabilities(unknown)
+                expected = sum(
+                    count * weight(mines) * (remaining - mines)
+                    for mines, count in all_ways.items()
+                ) / (total * interior)
+            for cell in interior_cells:
+                probabilities[cell] = expected
+
+        return probabilities
+
+    def components(self):
+        """
+        Splits the knowledge base into groups of sentences that share
+        no cells with any other group.
+        Returns a list of (cells, sentences) pairs.
+        """
+        components = []
+        seen = set()
+        for sentence in self.knowledge:
+            if sentence in seen:
+                continue
+            seen.add(sentence)
+            cells = set()
+            sentences = []
+            queue = [sentence]
+            while queue:
+                current = queue.pop()
+                sentences.append(current)
+                for cell in current:
+                    if cell in cells:
+                        continue
+                    cells.add(cell)
+                    for other in self.sentences_by_cell[cell]:
+                        if other not in seen:
+                            seen.add(other)
+                            queue.append(other)
+            components.append((cells, sentences))
+        return components
+
+    def count_configurations(self, cells, sentences, deadline):
+        """
+        Enumerates the mine placements over `cells` consistent with
+        `sentences`. Returns (cells, ways, mine_counts), where ways[k]
+        is the number of placements with k mines and mine_counts[k][cell]
+        is how many of those have a mine in the cell.
+        """
+        cells = sorted(cells)
+        sentence_index = {sentence: i for i, sentence in enumerate(sentences)}
+        cell_sentences = [
+            [sentence_index[sentence] for sentence in self.sentences_by_cell[cell]]
+            for cell in cells
+        ]
+        needed = [sentence.count for sentence in sentences]
+        unassigned = [len(sentence) for sentence in sentences]
+        placement = [0] * len(cells)
+        ways = {}
+        mine_counts = {}
+        steps = 0
+
+        def place(position, is_mine):
+            """
+            Counts `is_mine` at `position` in its sentences, returning whether
+            they can all still be satisfied.
+            """
+            consistent = True
+            for i in cell_sentences[position]:
+                needed[i] -= is_mine
+                unassigned[i] -= 1
+                if needed[i] < 0 or needed[i] > unassigned[i]:
+                    consistent = False
+            return consistent
+
+        def unplace(position, is_mine):
+            for i in cell_sentences[position]:
+                needed[i] += is_mine
+                unassigned[i] += 1
+
+        # Depth-first over positions with an explicit stack rather than
+        # recursion, so large components cannot exceed the recursion limit:
+        # tried[position] is the value last placed there, -1 if none yet
+        tried = [-1] * len(cells)
+        position = 0
+        mines = 0
+        while position >= 0:
+            steps += 1
+            if steps & 1023 == 0 and time.perf_counter() > deadline:
+                raise EnumerationTimeout
+            if position == len(cells):
+                ways[mines] = ways.get(mines, 0) + 1
+                counts = mine_counts.setdefault(mines, dict.fromkeys(cells, 0))
+                for cell, is_mine in zip(cells, placement):
+                    counts[cell] += is_mine
+                position -= 1
+                continue
+
+            # Take back the value last placed here, then try the next one
+            if tried[position] >= 0:
+                unplace(position, tried[position])
+                mines -= tried[position]
+            for is_mine in range(tried[position] + 1, 2):
+                tried[position] = is_mine
+                if place(position, is_mine):
+                    placement[position] = is_mine
+                    mines += is_mine
+                    position += 1
+                    break
+                unplace(position, is_mine)
+            else:
+                tried[position] = -1
+                position -= 1
+
+        return cells, ways, mine_counts
+
+    def estimate_probabilities(self, unknown):
+        """
+        Returns a quick estimate of the chance that each cell in `unknown`
+        is a mine, using the most pessimistic sentence mentioning it.
+        """
+        if self.total_mines is None:
+            default = 0.5
+        else:
+            default = (self.total_mines - self.mines_known()) / len(unknown)
+        probabilities = {}
+        for cell in unknown:
+            probabilities[cell] = max(
+                (sentence.count / len(sentence) for sentence in self.sentences_by_cell.get(cell, ())),
+                default=default
+            )
+        return probabilities
 
     def find_all_neighbors(self, cell):
           """
@@ -269,3 +585,26 @@ class MinesweeperAI():
                       neighbours.add((x, y))
           
           return neighbours
+
+
+def convolve(first, second):
+    """
+    Returns the distribution of the total number of mines given two
+    independent mappings from numbers of mines to numbers of ways.
+    """
+    combined = {}
+    for first_mines, first_count in first.items():
+        for second_mines, second_count in second.items():
+            mines = first_mines + second_mines
+            combined[mines] = combined.get(mines, 0) + first_count * second_count
+    return combined
+
+
+@lru_cache(maxsize=None)
+def ways_to_place(cells, mines):
+    """
+    Returns the number of ways to place `mines` mines among `cells` cells.
+    """
+    if mines < 0 or mines > cells:
+        return 0
+    return math.comb(cells, mines)
@@ -1,16 +1,55 @@
+import hashlib
+import json
+import math
 import os
 import random
 import re
 import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
 
 DAMPING = 0.85
 SAMPLES = 10000
 
+# Characters read from an HTML file at a time while crawling
+CHUNK_SIZE = 1 << 16
+
+# Corpora with fewer pages than this are crawled in-process, since starting
+# worker processes takes longer than parsing them
+PARALLEL_CRAWL_PAGES = 10000
+
+# Links in an HTML page
+LINK_PATTERN = re.compile(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+
+# File in a corpus directory saving the link graph and PageRank values
+# of the last incremental run, and the version of its format
+STATE_FILENAME = "pagerank.state"
+STATE_VERSION = 2
+
+# Independent random surfers used by parallel_sample_pagerank
+WALKERS = 16
+
+# Largest change in any PageRank value at which iterate_pagerank has converged
+TOLERANCE = 0.001
+
+# Iterations after which iterate_pagerank stops even if not converged
+MAX_ITERATIONS = 1000
+
+# Iterations run and the largest change in any value after each of them,
+# for the most recent call to iterate_pagerank
+last_iteration = {"iterations": 0, "residuals": []}
+
 
 def main():
+    if len(sys.argv) == 3 and sys.argv[1] == "--incremental":
+        ranks = incremental_pagerank(sys.argv[2], DAMPING)
+        print(f"PageRank Results from Incremental Iteration ({last_iteration['iterations']} iterations)")
+        for page in sorted(ranks):
+            print(f"  {page}: {ranks[page]:.4f}")
+        return
     if len(sys.argv) != 2:
-        sys.exit("Usage: python pagerank.py corpus")
-    corpus = crawl(sys.argv[1])
+        sys.exit("Usage: python pagerank.py [--incremental] corpus")
+    corpus = crawl_graph(sys.argv[1])
     ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
     print(f"PageRank Results from Sampling (n = {SAMPLES})")
     for page in sorted(ranks):
@@ -21,6 +60,59 @@ def main():
         print(f"  {page}: {ranks[page]:.4f}")
 
 
+class LinkGraph():
+    """
+    Link graph of a corpus with pages numbered in sorted order, stored as
+    CSR arrays: the pages linked to by page i are
+    links[offsets[i]:offsets[i + 1]].
+    """
+
+    def __init__(self, pages, offsets, links):
+        self.pages = pages
+        self.offsets = offsets
+        self.links = links
+
+    @classmethod
+    def from_corpus(cls, corpus):
+        """
+        Return the LinkGraph of a dictionary as returned by `crawl`.
+        """
+        pages = sorted(corpus)
+        index = {page: i for i, page in enumerate(pages)}
+        offsets = array("l", [0])
+        links = array("l")
+        for page in pages:
+            links.extend(sorted(index[link] for link in corpus[page]))
+            offsets.append(len(links))
+        return cls(pages, offsets, links)
+
+    def degrees(self):
+        """
+        Return the number of links on each page.
+        """
+        offsets = self.offsets
+        return [offsets[i + 1] - offsets[i] for i in range(len(self.pages))]
+
+    def incoming(self):
+        """
+        Return (offsets, sources) CSR arrays of the pages linking to each page.
+        """
+        size = len(self.pages)
+        offsets = array("l", [0]) * (size + 1)
+        for link in self.links:
+            offsets[link + 1] += 1
+        for i in range(size):
+            offsets[i + 1] += offsets[i]
+
+        sources = array("l", [0]) * len(self.links)
+        position = array("l", offsets[:-1])
+        for page in range(size):
+            for link in self.links[self.offsets[page]:self.offsets[page + 1]]:
+                sources[position[link]] = page
+                position[link] += 1
+        return offsets, sources
+
+
 def crawl(directory):
     """
     Parse a directory of HTML pages and check for links to other pages.
@@ -35,7 +127,7 @@ def crawl(directory):
             continue
         with open(os.path.join(directory, filename)) as f:
             contents = f.read()
-            links = re.findall(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"", contents)
+            links = LINK_PATTERN.findall(contents)
             pages[filename] = set(links) - {filename}
 
     # Only include links to other pages in the corpus
@@ -48,6 +140,80 @@ def crawl(directory):
     return pages
 
 
+def crawl_graph(directory, workers=1):
+    """
+    Parse a directory of HTML pages into a LinkGraph, as `crawl` does but
+    without building a set of page names per page.
+    Pages are numbered in sorted order before any is read, so with
+    `workers` other than 1 (None for one per CPU), corpora of at least
+    PARALLEL_CRAWL_PAGES pages are parsed by that many processes, each
+    returning the ids each page links to.
+    Files are read in chunks rather than whole.
+    """
+    pages = sorted(filename for filename in os.listdir(directory) if filename.endswith(".html"))
+    index = {page: i for i, page in enumerate(pages)}
+
+    offsets = array("l", [0])
+    links = array("l")
+    if workers == 1 or len(pages) < PARALLEL_CRAWL_PAGES:
+        for page in pages:
+            links.extend(page_links(os.path.join(directory, page), index))
+            offsets.append(len(links))
+        return LinkGraph(pages, offsets, links)
+
+    with ProcessPoolExecutor(workers, initializer=start_crawl_worker, initargs=(directory, index)) as pool:
+        chunksize = max(1, len(pages) // (4 * (workers or os.cpu_count() or 1)))
+        for page_ids in pool.map(worker_page_links, pages, chunksize=chunksize):
+            links.extend(page_ids)
+            offsets.append(len(links))
+
+    return LinkGraph(pages, offsets, links)
+
+
+def page_links(path, index):
+    """
+    Return a sorted array of the ids in `index` of the pages linked to by
+    the HTML file at `path`, other than itself.
+    """
+    page = index.get(os.path.basename(path))
+    return array("l", sorted(index[link] for link in page_link_names(path) if link in index and index[link] != page))
+
+
+def page_link_names(path):
+    """
+    Return the set of names linked to by the HTML file at `path`.
+    """
+    found = set()
+    with open(path) as f:
+        pending = ""
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            text = pending + chunk
+
+            # Hold back anything after the last complete tag for the next chunk
+            end = text.rfind(">") + 1 if chunk else len(text)
+            found.update(LINK_PATTERN.findall(text, 0, end))
+            pending = text[end:]
+            if not chunk:
+                break
+    return found
+
+
+# Corpus directory and page ids given to each crawling worker process
+worker_directory = None
+worker_index = None
+
+
+def start_crawl_worker(directory, index):
+    global worker_directory, worker_index
+    worker_directory = directory
+    worker_index = index
+
+
+def worker_page_links(page):
+    return page_links(os.path.join(worker_directory, page), worker_index)
+
+
 def transition_model(corpus, page, damping_factor):
     """
     Return a probability distribution over which page to visit next,
@@ -89,76 +255,330 @@ def sample_pagerank(corpus, damping_factor, n):
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
+    `corpus` may be a dictionary as returned by `crawl` or a LinkGraph.
+    To run many surfers at once, use `parallel_sample_pagerank`.
     """
+    graph = LinkGraph.from_corpus(corpus) if isinstance(corpus, dict) else corpus
+    counts = [0] * len(graph.pages)
+    random_walk(graph, damping_factor, n, counts)
 
-    # Initialise a dictionary where the number of samples is equal to zero
-    samples_dict = corpus.copy()
-    for i in samples_dict:
-        samples_dict[i] = 0
-    sample = None
-
-    # Iterate n times, as we are sampling n pages
-    for _ in range(n):
-        if sample:
-            # If there is a previous sample available, then choose using the transition model
-            distribution = transition_model(corpus, sample, damping_factor)
-            distribution_list = list(distribution.keys())
-            distribution_weights = [distribution[i] for i in distribution]
-            sample = random.choices(distribution_list, distribution_weights, k=1)[0]
-        else:
-            # If there is no previous sample available, then choose randomly
-            sample = random.choice(list(corpus.keys()))
+    # Convert sample count to percentage
+    return {page: count / n for page, count in zip(graph.pages, counts)}
 
-        # Count each sample
-        samples_dict[sample] += 1
 
-    # Convert sample count to percentage
-    for i in samples_dict:
-        samples_dict[i] /= n
+def random_walk(graph, damping_factor, steps, counts, rng=random):
+    """
+    Walk `steps` pages of `graph` according to transition model, starting
+    with a page at random, adding one to `counts` for each page visited.
+    Each step takes constant time: a link is chosen by its position on the
+    page rather than from a distribution over the whole corpus.
+    """
+    offsets = graph.offsets
+    links = graph.links
+    num_of_pages = len(graph.pages)
+    uniform = rng.random
+
+    page = int(uniform() * num_of_pages)
+    for step in range(steps):
+        if step:
+            first = offsets[page]
+            degree = offsets[page + 1] - first
+
+            # Follow a link with probability `damping_factor`, if there are any
+            if degree and uniform() < damping_factor:
+                page = links[first + int(uniform() * degree)]
+            else:
+                page = int(uniform() * num_of_pages)
+        counts[page] += 1
+
+
+def parallel_sample_pagerank(corpus, damping_factor, n, walkers=WALKERS, workers=None, seed=None):
+    """
+    Return PageRank values for each page as `sample_pagerank` does, sharing
+    the `n` samples between `walkers` independent random surfers run across
+    a pool of `workers` processes, together with the standard error of each
+    value.
+    Return two dictionaries where keys are page names: the estimated
+    PageRank values, and their standard errors estimated from how much the
+    walkers' own estimates differ. Errors shrink with the square root of
+    `n`, so see `samples_for_error` to choose `n` for a target accuracy.
+    Walker i is seeded from `seed` and i, so the results are reproducible.
+    There are never more walkers than samples, so every walk has a page.
+    """
+    walkers = min(walkers, n)
+    if walkers < 2:
+        raise ValueError("at least two walkers and two samples are needed to estimate errors")
+    graph = LinkGraph.from_corpus(corpus) if isinstance(corpus, dict) else corpus
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    seeds = [f"{seed}-{walker}" for walker in range(walkers)]
+    steps = [n // walkers + (walker < n % walkers) for walker in range(walkers)]
+
+    with ProcessPoolExecutor(workers, initializer=start_walk_worker, initargs=(graph, damping_factor)) as pool:
+        walks = list(pool.map(worker_walk, seeds, steps))
+
+    ranks = {}
+    errors = {}
+    for page, counts in zip(graph.pages, zip(*walks)):
+        estimates = [count / length for count, length in zip(counts, steps)]
+        mean = sum(counts) / n
+        variance = sum((estimate - mean) ** 2 for estimate in estimates) / (walkers - 1)
+        ranks[page] = mean
+        errors[page] = math.sqrt(variance / walkers)
+    return ranks, errors
+
+
+def samples_for_error(errors, n, target):
+    """
+    Return the number of samples expected to bring the largest of `errors`,
+    as estimated from `n` samples, down to `target`.
+    """
+    return math.ceil(n * (max(errors.values()) / target) ** 2)
+
+
+# Link graph and damping factor given to each sampling worker process
+worker_graph = None
+worker_damping = DAMPING
+
 
-    return samples_dict
+def start_walk_worker(graph, damping_factor):
+    global worker_graph, worker_damping
+    worker_graph = graph
+    worker_damping = damping_factor
 
 
-def iterate_pagerank(corpus, damping_factor):
+def worker_walk(seed, steps):
+    counts = [0] * len(worker_graph.pages)
+    random_walk(worker_graph, worker_damping, steps, counts, random.Random(seed))
+    return counts
+
+
+def iterate_pagerank(corpus, damping_factor, tolerance=TOLERANCE, max_iterations=MAX_ITERATIONS, start=None):
     """
     Return PageRank values for each page by iteratively updating
     PageRank values until convergence.
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
+    `corpus` may be a dictionary as returned by `crawl` or a LinkGraph.
+    Iteration stops once no value changes by more than `tolerance`, or
+    after `max_iterations` iterations.
+    Iteration starts from the values in dictionary `start`, such as those
+    of an earlier run, rescaled to sum to 1, with pages missing from it
+    starting at 1/n.
+    """
+    graph = LinkGraph.from_corpus(corpus) if isinstance(corpus, dict) else corpus
+    num_of_pages = len(graph.pages)
+    degrees = graph.degrees()
+
+    # Pages linking to each page, sliced once from the transposed link graph
+    offsets, sources = graph.incoming()
+    linking_pages = [sources[offsets[page]:offsets[page + 1]] for page in range(num_of_pages)]
+
+    # Pages with no links are interpreted as having one link for every page
+    dangling = [page for page in range(num_of_pages) if degrees[page] == 0]
+
+    # Assign each page a PageRank value of 1/n, i.e. random selection
+    ranks = [1 / num_of_pages] * num_of_pages
+    if start is not None:
+        ranks = [start.get(page, rank) for page, rank in zip(graph.pages, ranks)]
+        total = sum(ranks)
+        ranks = [rank / total for rank in ranks]
+
+    last_iteration["iterations"] = 0
+    last_iteration["residuals"] = residuals = []
+    while len(residuals) < max_iterations:
+
+        # Share of its rank that each page passes along each of its links
+        shares = [rank / degree if degree else 0.0 for rank, degree in zip(ranks, degrees)]
+        share_of = shares.__getitem__
+
+        random_rank = (1 - damping_factor) / num_of_pages
+        random_rank += damping_factor * sum(ranks[page] for page in dangling) / num_of_pages
+        new_ranks = [
+            random_rank + damping_factor * sum(map(share_of, linking))
+            for linking in linking_pages
+        ]
+
+        change = max(abs(new - old) for new, old in zip(new_ranks, ranks))
+        residuals.append(change)
+        ranks = new_ranks
+        if change < tolerance:
+            break
+
+    last_iteration["iterations"] = len(residuals)
+    return dict(zip(graph.pages, ranks))
+
+
+def incremental_pagerank(directory, damping_factor, tolerance=TOLERANCE):
+    """
+    Return PageRank values for each page of a directory of HTML pages as
+    `iterate_pagerank` does, reusing the link graph and values saved in
+    the directory by the previous call.
+    Only files whose size or modification time changed are hashed, and
+    only those whose contents changed are parsed again. Iteration starts
+    from the previous values, so after a few pages change it converges in
+    a few iterations instead of starting over from 1/n.
+    """
+    path = os.path.join(directory, STATE_FILENAME)
+    state = read_state(path)
+    old_pages = state["pages"]
+    old_offsets = state["offsets"]
+    old_links = state["links"]
+    old_index = {page: i for i, page in enumerate(old_pages)}
+
+    pages = sorted(filename for filename in os.listdir(directory) if filename.endswith(".html"))
+    index = {page: i for i, page in enumerate(pages)}
+
+    # New id of each previously saved page, or -1 if it has been removed
+    renumber = array("l", (index.get(page, -1) for page in old_pages))
+
+    offsets = array("l", [0])
+    links = array("l")
+    unresolved = {}
+    signatures = {}
+    for page in pages:
+        file_path = os.path.join(directory, page)
+        stat = os.stat(file_path)
+        size_and_time = (stat.st_size, stat.st_mtime_ns)
+        old = old_index.get(page)
+
+        # A file that was touched but not edited keeps its links
+        digest = None
+        if old is not None:
+            old_size, old_time, digest = state["signatures"][page]
+            if (old_size, old_time) != size_and_time and file_digest(file_path) != digest:
+                old = None
+        if old is None:
+            digest = file_digest(file_path)
+            names = page_link_names(file_path) - {page}
+            page_ids = [index[name] for name in names if name in index]
+            missing = [name for name in names if name not in index]
+        else:
+
+            # Renumber saved links, setting aside links to removed pages,
+            # and resolve saved links to pages that have since been added
+            page_ids = []
+            missing = []
+            for link in old_links[old_offsets[old]:old_offsets[old + 1]]:
+                if renumber[link] >= 0:
+                    page_ids.append(renumber[link])
+                else:
+                    missing.append(old_pages[link])
+            for name in state["unresolved"].get(page, ()):
+                if name in index:
+                    page_ids.append(index[name])
+                else:
+                    missing.append(name)
+
+        links.extend(sorted(page_ids))
+        offsets.append(len(links))
+        if missing:
+            unresolved[page] = missing
+        signatures[page] = [*size_and_time, digest]
+
+    graph = LinkGraph(pages, offsets, links)
+    ranks = iterate_pagerank(graph, damping_factor, tolerance, start=dict(zip(old_pages, state["ranks"])))
+
+    write_state(path, {
+        "version": STATE_VERSION,
+        "pages": pages,
+        "offsets": offsets.tolist(),
+        "links": links.tolist(),
+        "unresolved": unresolved,
+        "signatures": signatures,
+        "ranks": [ranks[page] for page in pages],
+    })
+    return ranks
+
+
+def file_digest(path):
+    """
+    Return a hash of the contents of the file at `path`.
+    """
+    digest = hashlib.blake2b()
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_state(path):
+    """
+    Return the state saved by `write_state` at `path`, or an empty state if
+    there is none, it was saved by another version, or it is inconsistent.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        state = None
+    if not valid_state(state):
+        return {
+            "pages": [], "offsets": array("l", [0]), "links": array("l"),
+            "unresolved": {}, "signatures": {}, "ranks": [],
+        }
+    state["offsets"] = array("l", state["offsets"])
+    state["links"] = array("l", state["links"])
+    return state
+
+
+def valid_state(state):
+    """
+    Return whether `state`, as loaded from a state file, has every field
+    `incremental_pagerank` uses, with consistent types and sizes.
+    """
+    if not isinstance(state, dict) or state.get("version") != STATE_VERSION:
+        return False
+    pages = state.get("pages")
+    offsets = state.get("offsets")
+    links = state.get("links")
+    unresolved = state.get("unresolved")
+    signatures = state.get("signatures")
+    ranks = state.get("ranks")
+    if not all(isinstance(field, list) for field in (pages, offsets, links, ranks)):
+        return False
+    if not isinstance(unresolved, dict) or not isinstance(signatures, dict):
+        return False
+
+    size = len(pages)
+    if (len(offsets) != size + 1 or len(ranks) != size
+            or not all(isinstance(page, str) for page in pages)
+            or not all(isinstance(rank, (int, float)) and rank >= 0 for rank in ranks)):
+        return False
+
+    # CSR arrays must be ints, with offsets rising from 0 to the number of links
+    if not all(type(value) is int for value in offsets) or not all(type(value) is int for value in links):
+        return False
+    if offsets[0] != 0 or offsets[-1] != len(links) or any(a > b for a, b in zip(offsets, offsets[1:])):
+        return False
+    if any(not 0 <= link < size for link in links):
+        return False
+
+    for page in pages:
+        signature = signatures.get(page)
+        if (not isinstance(signature, list) or len(signature) != 3
+                or type(signature[0]) is not int or type(signature[1]) is not int
+                or not isinstance(signature[2], str)):
+            return False
+    return all(
+        page in signatures and isinstance(names, list) and all(isinstance(name, str) for name in names)
+        for page, names in unresolved.items()
+    )
+
+
+def write_state(path, state):
+    """
+    Save `state` to `path` as JSON, replacing it only once it is fully written.
     """
-    num_of_pages = len(corpus)
-    new_dictionary = {}
-    old_dictionary = {}
-
-    # Assign each page a PageRank value of 1/n, where n is the number of pages in the corpus, i.e. random selection
-    for page in corpus:
-        old_dictionary[page] = 1 / num_of_pages
-
-    # Repeatedly calculate new PageRank values based on all of the current rank values
-    # This process should repeat until no PageRank value changes by more than 0.001 between the current rank values and the new rank values
-    change = 1
-    while change >= 0.001:
-        for page in corpus:
-            new_val = 0
-            for linking_page in corpus:
-
-                # Check if the current page links to the current linking page
-                if page in corpus[linking_page]:
-                    new_val += (old_dictionary[linking_page] / len(corpus[linking_page]))
-
-                # If the current page has no links, then interpret it as having one link for every other page
-                if len(corpus[linking_page]) == 0:
-                    new_val += (old_dictionary[linking_page]) / len(corpus)
-            new_val *= damping_factor
-            new_val += (1 - damping_factor) / num_of_pages
-
-            new_dictionary[page] = new_val
-      
-        change = max([abs(new_dictionary[x] - old_dictionary[x]) for x in old_dictionary])
-        old_dictionary = new_dictionary.copy()
-
-    return old_dictionary
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
 
 
 if __name__ == "__main__":